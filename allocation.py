@@ -0,0 +1,79 @@
+"""First-expiry-first-out fulfilment of blood requests with ABO/Rh-compatible substitution."""
+from collections import Counter
+
+from inventory_summary import apply_deltas
+
+# Red-cell donor types each recipient type can receive, in order of preference (exact match first).
+COMPATIBLE_DONORS = {
+    'O-': ['O-'],
+    'O+': ['O+', 'O-'],
+    'A-': ['A-', 'O-'],
+    'A+': ['A+', 'A-', 'O+', 'O-'],
+    'B-': ['B-', 'O-'],
+    'B+': ['B+', 'B-', 'O+', 'O-'],
+    'AB-': ['AB-', 'A-', 'B-', 'O-'],
+    'AB+': ['AB+', 'AB-', 'A+', 'A-', 'B+', 'B-', 'O+', 'O-'],
+}
+ALLOCATION_MODES = {'issue': ('Issued', 'Fulfilled'), 'reserve': ('Reserved', 'Approved')} # mode -> (unit status, request status)
+
+
+class AllocationError(Exception):
+    def __init__(self, message, status=409):
+        super().__init__(message)
+        self.status = status
+
+
+def _lock_units(cursor, where, values, limit):
+    # SKIP LOCKED: units another fulfilment is holding are passed over instead of waited on (or issued twice).
+    cursor.execute(
+        "SELECT bu.unit_id, bu.blood_group, bu.rh_factor, bu.status, bu.expiry_date, d.donor_id "
+        "FROM blood_units bu JOIN donations d ON bu.donation_id = d.donation_id "
+        f"WHERE {where} ORDER BY bu.expiry_date, bu.unit_id LIMIT %s FOR UPDATE OF bu SKIP LOCKED", (*values, limit))
+    return cursor.fetchall()
+
+
+def allocate_request(conn, request_id, mode='issue', allow_substitutes=True):
+    """Reserves or issues a request's `quantity` units FEFO in one transaction, or allocates nothing.
+
+    'reserve' holds units for the request (request -> Approved); 'issue' hands them to the requesting
+    organization (request -> Fulfilled), consuming units previously reserved for it first.
+    """
+    if mode not in ALLOCATION_MODES: raise AllocationError(f"mode must be one of {', '.join(ALLOCATION_MODES)}", 400)
+    unit_status, request_status = ALLOCATION_MODES[mode]
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT org_id, blood_group, rh_factor, quantity, status FROM blood_requests WHERE request_id = %s FOR UPDATE", (request_id,))
+        row = cursor.fetchone()
+        if not row: raise AllocationError("Blood request not found", 404)
+        org_id, blood_group, rh_factor, quantity, status = row
+        if status not in ('Pending', 'Approved'): raise AllocationError(f"Request is already {status}")
+        if status == 'Approved' and mode == 'reserve': raise AllocationError("Units are already reserved for this request")
+
+        units = []
+        if status == 'Approved': # issuing a reserved request
+            units += _lock_units(cursor, "bu.allocated_request_id = %s AND bu.status = 'Reserved'", (request_id,), quantity)
+        for donor_type in COMPATIBLE_DONORS[f"{blood_group}{rh_factor}"] if allow_substitutes else [f"{blood_group}{rh_factor}"]:
+            if len(units) >= quantity: break
+            units += _lock_units(cursor, "bu.blood_group = %s AND bu.rh_factor = %s AND bu.status = 'In Stock' AND bu.expiry_date >= CURDATE()",
+                                 (donor_type[:-1], donor_type[-1]), quantity - len(units))
+        if len(units) < quantity:
+            raise AllocationError(f"Only {len(units)} of {quantity} compatible unit(s) available")
+
+        unit_ids = [u[0] for u in units]
+        placeholders = ", ".join(["%s"] * len(unit_ids))
+        cursor.execute(f"UPDATE blood_units SET status = %s, issued_to_org_id = %s, allocated_request_id = %s WHERE unit_id IN ({placeholders})",
+                       (unit_status, org_id if unit_status == 'Issued' else None, request_id, *unit_ids))
+        deltas = Counter()
+        for _, group, rh, old_status, _, _ in units:
+            deltas[(group, rh, old_status)] -= 1; deltas[(group, rh, unit_status)] += 1
+        apply_deltas(cursor, deltas)
+        cursor.execute("UPDATE blood_requests SET status = %s WHERE request_id = %s", (request_status, request_id))
+        conn.commit()
+    except Exception:
+        conn.rollback(); raise
+    finally:
+        cursor.close()
+    requested = f"{blood_group}{rh_factor}"
+    allocated = [{"unit_id": u[0], "blood_type": f"{u[1]}{u[2]}", "expiry_date": u[4], "from": u[3]} for u in units]
+    return {"request_id": request_id, "org_id": org_id, "status": request_status, "units": allocated,
+            "substituted": sum(1 for u in allocated if u["blood_type"] != requested), "donor_ids": sorted({u[5] for u in units})}
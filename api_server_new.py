@@ -4,6 +4,10 @@ import uuid
 import mysql.connector
 from datetime import datetime, timedelta
 import sys
+from db_pool import ConnectionPool, init_app as init_db_pool, request_connection
+from donor_search import escape_like
+from cache import TTLCache
+from idempotency import IdempotencyStore, idempotent
 
 # --- 1. CONFIGURATION ---
 # CRITICAL: Replace with your actual MySQL credentials
@@ -13,33 +17,46 @@ DB_CONFIG = {
     'password': 'Riyu22@@', 
     'database': 'blood_bank_db'
 }
+POOL_CONFIG = {'size': 10, 'max_lifetime': 1800, 'borrow_timeout': 5, 'health_check_interval': 30}
 
 app = Flask(__name__)
 CORS(app) # Enable CORS for frontend communication (necessary when running HTML locally)
 
+DB_POOL = ConnectionPool(DB_CONFIG, **POOL_CONFIG)
+init_db_pool(app, DB_POOL) # Releases each request's borrowed connection on teardown
+STAFF_ID_CACHE = TTLCache(maxsize=16, ttl=600) # employee_number -> staff_id
+IDEMPOTENCY_STORE = IdempotencyStore(maxsize=20000, ttl=86400) # Idempotency-Key -> first /api/collection/finalize response
+
 # --- 2. DB CONNECTION AND UTILITIES ---
 
 def get_db_connection():
+    """Returns the request's pooled connection; every helper in one request shares it."""
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
+        conn = request_connection(DB_POOL)
         return conn
     except mysql.connector.Error as err:
         print(f"[DB ERROR] Failed to connect: {err}")
         return None
 
 def get_default_phlebotomist_id():
-    """Retrieves the default PHL001 staff_id for FKs."""
+    """Retrieves the default PHL001 staff_id for FKs (cached; only found ids are kept)."""
+    staff_id = STAFF_ID_CACHE.get('PHL001')
+    if staff_id is not None: return staff_id
     conn = get_db_connection()
     if not conn: return None
+    # Buffered and closed before returning: the request's other helpers reuse this connection, which an unread result would block.
+    cursor = conn.cursor(buffered=True)
     try:
-        cursor = conn.cursor()
         cursor.execute("SELECT staff_id FROM staff WHERE employee_number = 'PHL001'")
         result = cursor.fetchone()
-        conn.close()
+        if result: STAFF_ID_CACHE.set('PHL001', result[0])
         return result[0] if result else None
-    except Exception:
-        if conn and conn.is_connected(): conn.close()
+    except mysql.connector.Error as err:
+        print(f"[DB ERROR] Staff lookup failed: {err}")
         return None
+    finally:
+        cursor.close()
+        conn.close()
 
 def db_execute_transaction(sql_commands):
     """Executes a list of SQL commands in a single transaction."""
@@ -61,39 +78,42 @@ def db_execute_transaction(sql_commands):
         conn.close()
 
 def db_search_donor_by_last_name(last_name):
-    """Searches for donors by last name."""
+    """Searches for donors whose last name starts with `last_name` (index-backed prefix match)."""
     conn = get_db_connection()
     if not conn: return []
-    sql = "SELECT donor_id, first_name, last_name, blood_group FROM donor WHERE last_name = %s"
+    sql = "SELECT donor_id, first_name, last_name, blood_group FROM donor WHERE last_name LIKE %s ORDER BY last_name, first_name LIMIT 50"
+    cursor = conn.cursor(dictionary=True, buffered=True)
     try:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute(sql, (last_name,))
-        results = cursor.fetchall()
-        conn.close()
-        return results
-    except Exception:
-        if conn and conn.is_connected(): conn.close()
+        cursor.execute(sql, (escape_like(last_name) + '%',))
+        return cursor.fetchall()
+    except mysql.connector.Error as err:
+        print(f"[DB ERROR] Donor search failed: {err}")
         return []
+    finally:
+        cursor.close()
+        conn.close()
 
 def db_search_screening_by_donor_id(donor_id):
-    """Searches for the latest ELIGIBLE screening record."""
+    """Searches for the latest ELIGIBLE screening record, with the donation already collected against it (if any)."""
     conn = get_db_connection()
     if not conn: return None
     sql = """
-    SELECT screening_id, eligible, screening_datetime
-    FROM donor_screening 
-    WHERE donor_id = %s AND eligible = 'Eligible'
-    ORDER BY screening_datetime DESC LIMIT 1
+    SELECT ds.screening_id, ds.eligible, ds.screening_datetime, dr.donation_id AS collected_donation_id
+    FROM donor_screening ds
+    LEFT JOIN donation_record dr ON dr.screening_id = ds.screening_id
+    WHERE ds.donor_id = %s AND ds.eligible = 'Eligible'
+    ORDER BY ds.screening_datetime DESC LIMIT 1
     """
+    cursor = conn.cursor(dictionary=True, buffered=True)
     try:
-        cursor = conn.cursor(dictionary=True)
         cursor.execute(sql, (donor_id,))
-        result = cursor.fetchone()
-        conn.close()
-        return result
-    except Exception:
-        if conn and conn.is_connected(): conn.close()
+        return cursor.fetchone()
+    except mysql.connector.Error as err:
+        print(f"[DB ERROR] Screening lookup failed: {err}")
         return None
+    finally:
+        cursor.close()
+        conn.close()
 
 # --- 3. API ENDPOINTS ---
 
@@ -164,6 +184,7 @@ def api_save_screening():
         return jsonify({"status": "error", "message": f"Screening failed: {message}"}), 500
 
 @app.route('/api/collection/finalize', methods=['POST'])
+@idempotent(IDEMPOTENCY_STORE, error_body=lambda message: {"status": "error", "message": message})
 def api_finalize_collection():
     data = request.get_json()
     donor_id = data.get('donorId')
@@ -174,6 +195,8 @@ def api_finalize_collection():
     if not screening_result:
         return jsonify({"status": "error", "message": "Donor not eligible or no recent screening record found."}), 403
     
+    if screening_result.get('collected_donation_id'):
+        return jsonify({"status": "error", "message": "The latest eligible screening has already been collected.", "donationId": screening_result['collected_donation_id'][:8]}), 409
     screening_id = screening_result['screening_id']
     phlebotomist_id = get_default_phlebotomist_id()
     if not phlebotomist_id:
@@ -213,6 +236,10 @@ def api_finalize_collection():
     else:
         return jsonify({"status": "error", "message": f"Transaction failed: {message}"}), 500
 
+@app.route('/api/db/pool', methods=['GET'])
+def api_pool_metrics():
+    return jsonify(DB_POOL.metrics()), 200
+
 # --- 4. SERVER STARTUP ---
 
 if __name__ == '__main__':
@@ -1,9 +1,31 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+import hashlib
 import mysql.connector
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, Response, stream_with_context
 from flask_cors import CORS
+from db_pool import ConnectionPool, init_app as init_db_pool, request_connection
+from db_router import DatabaseRouter, init_app as init_db_router, read_connection
+from exports import EXPORT_FORMATS, iter_export
+from inventory_summary import SUMMARY_QUERY, record_unit_added, record_status_change, reconcile as reconcile_inventory_summary
+from bulk_ingest import MAX_BATCH_ROWS, read_batch_rows, insert_chunks
+from eligibility import RULESETS, parse_vitals, reevaluate_screenings
+from serialization import AppJSONProvider, columnar, wants_columns
+from compression import init_app as init_compression
+from cache import TTLCache
+from allocation import ALLOCATION_MODES, AllocationError, allocate_request
+from events import EventBroker, iter_sse
+from forecast import DemandForecaster
+from recall import donation_statements as recall_donation_statements, iter_recall_export, parse_blood_types, recall_page, record_screening, refresh_donors as refresh_recall
+from expiry_sweeper import ExpirySweeper, near_expiry_alerts
+from unit_transitions import MAX_TRANSITION_UNITS, UNIT_STATUSES, transition_error, transition_units
+from audit_log import AuditLog, trace_unit, unit_event
+from archive import HOT_TABLES, run_archive, wants_full_history, with_archive
+from idempotency import IdempotencyStore, idempotent
+from instrumentation import Metrics, SamplingProfiler, init_app as init_metrics, instrument_pool
+from donor_search import DEFAULT_LIMIT as SEARCH_DEFAULT_LIMIT, MAX_LIMIT as SEARCH_MAX_LIMIT, DonorPrefixIndex, escape_like, find_donors
 
 app = Flask(__name__)
+app.json = AppJSONProvider(app) # dates/datetimes/DECIMALs serialize natively
 CORS(app)
 
 DB_CONFIG = {
@@ -12,14 +34,196 @@ DB_CONFIG = {
     'password': 'XXXXXXX',  # <<<--- UPDATE YOUR PASSWORD
     'database': 'blood_bank_db'
 }
+POOL_CONFIG = {'size': 10, 'max_lifetime': 1800, 'borrow_timeout': 5, 'health_check_interval': 30}
+REPLICA_CONFIGS = [] # read replicas, e.g. [{**DB_CONFIG, 'host': 'replica1'}]; empty: every read uses DB_CONFIG
+ROUTING_CONFIG = {'max_lag_seconds': 5, 'lag_check_interval': 2, 'pin_seconds': 10, 'down_retry_seconds': 10} # see db_router.py
+DONOR_SEARCH_CONFIG = {'in_process_index': False} # enable only for single-process deployments
+ELIGIBILITY_CONFIG = {'rules_version': 'v1'} # see eligibility.RULESETS
+SWEEP_CONFIG = {'in_process': False, 'interval': 300, 'batch_size': 500, 'max_batches': 200, 'expired_status': 'Quarantined', 'alert_days': 3} # or run expiry_sweeper.py as a worker
+METRICS_CONFIG = {'slow_query_ms': 200, 'profiler_enabled': False, 'profiler_interval': 0.005, 'max_profile_seconds': 60}
+FORECAST_CONFIG = {'history_days': 90, 'short_window': 7, 'long_window': 28, 'horizon_days': 14, 'max_horizon_days': 60, 'target_days_of_supply': 5}
+RECALL_CONFIG = {'deferral_days': 56, 'page_size': 50, 'max_page_size': 500} # donor recall lists, see recall.py
+AUDIT_CONFIG = {'queue_size': 10000, 'batch_size': 500, 'flush_interval': 1.0, 'put_timeout': 0.05, 'months_ahead': 2} # unit_events write-behind
+IDEMPOTENCY_CONFIG = {'ttl': 86400, 'maxsize': 20000, 'wait_timeout': 30} # Idempotency-Key replay window for POST /api/donations
+COMPRESSION_CONFIG = {'min_size': 1024, 'gzip_level': 6, 'brotli_quality': 4} # gzip/brotli for responses of at least min_size bytes
+ARCHIVE_CONFIG = {'hot_days': 730, 'batch_size': 500, 'max_batches': 200} # closed records older than hot_days move to archive_* tables
+CACHE_CONFIG = {'donor_report_ttl': 300, 'donor_report_maxsize': 2048, 'reference_ttl': 600}
 
-def get_db_connection():
+init_compression(app, COMPRESSION_CONFIG)
+DB_POOL = ConnectionPool(DB_CONFIG, **POOL_CONFIG)
+init_db_pool(app, DB_POOL)
+REPLICA_POOLS = [ConnectionPool(config, **POOL_CONFIG) for config in REPLICA_CONFIGS]
+DB_ROUTER = DatabaseRouter(DB_POOL, REPLICA_POOLS, ROUTING_CONFIG)
+init_db_router(app, DB_ROUTER)
+METRICS = Metrics(slow_query_seconds=METRICS_CONFIG['slow_query_ms'] / 1000)
+instrument_pool(DB_POOL, METRICS)
+for replica_pool in REPLICA_POOLS: instrument_pool(replica_pool, METRICS)
+init_metrics(app, METRICS)
+PROFILER = SamplingProfiler(METRICS_CONFIG['profiler_interval']) if METRICS_CONFIG['profiler_enabled'] else None
+DONOR_INDEX = DonorPrefixIndex() if DONOR_SEARCH_CONFIG['in_process_index'] else None
+ACTIVE_RULESET = RULESETS[ELIGIBILITY_CONFIG['rules_version']]
+DONOR_REPORT_CACHE = TTLCache(CACHE_CONFIG['donor_report_maxsize'], CACHE_CONFIG['donor_report_ttl']) # (donor_id, columnar, full history) -> serialized report
+EVENTS = EventBroker() # change feed for /api/events
+AUDIT_LOG = AuditLog(DB_POOL, AUDIT_CONFIG) # unit lifecycle events, inserted in batches off the request path
+FORECASTER = DemandForecaster(FORECAST_CONFIG) # demand_daily snapshot refresh + per-type projections
+REFERENCE_CACHE = TTLCache(256, CACHE_CONFIG['reference_ttl']) # roles, tasks, staff, organizations, staff task lists
+IDEMPOTENCY_STORE = IdempotencyStore(**IDEMPOTENCY_CONFIG) # (path, Idempotency-Key) -> first response
+
+def get_db_connection(read_only=False, pin_keys=()):
+    # Borrowed from DB_POOL once per request; conn.close() is deferred until teardown.
+    # read_only=True may route to a replica, unless the client (or a pin_keys entry) wrote moments ago.
     try:
-        return mysql.connector.connect(**DB_CONFIG)
+        return read_connection(DB_ROUTER, *pin_keys) if read_only else request_connection(DB_POOL)
     except mysql.connector.Error as err:
         print(f"Database Connection Error: {err}")
         return None
 
+BLOOD_GROUPS = ('A', 'B', 'AB', 'O')
+INVENTORY_PAGE_SIZE = 50
+INVENTORY_MAX_PAGE_SIZE = 500
+INVENTORY_SELECT = "SELECT unit_id, CONCAT(blood_group, rh_factor) AS blood_type, status, expiry_date FROM blood_units"
+BLOOD_REQUEST_SELECT = ("SELECT r.request_id, r.status, r.quantity, r.request_date, o.name AS org_name, CONCAT(r.blood_group, r.rh_factor) AS blood_type "
+                        "FROM blood_requests r JOIN organization o ON r.org_id = o.org_id")
+DONATION_INSERT = "INSERT INTO donations (donor_id, screening_id, phlebotomist_staff_id, donation_date, collection_site) VALUES (%s, %s, %s, %s, %s)"
+UNIT_INSERT = "INSERT INTO blood_units (donation_id, blood_group, rh_factor, collection_date, expiry_date, status) VALUES (%s, %s, %s, %s, %s, 'In Stock')"
+# Table names are placeholders so ?history=full can run the same join over the archive tables (archive.with_archive).
+DONOR_HISTORY_SELECT = """
+    SELECT sc.screening_id, sc.screening_date, sc.is_eligible, sc.notes, s_screener.first_name as screener_fname, s_screener.last_name as screener_lname,
+           d.donation_id, d.donation_date, s_phleb.first_name as phleb_fname, s_phleb.last_name as phleb_lname,
+           bu.unit_id, bu.status as unit_status, bu.expiry_date, o.name as issued_to_org
+    FROM {screenings} sc
+    LEFT JOIN {donations} d ON sc.screening_id = d.screening_id
+    LEFT JOIN {blood_units} bu ON d.donation_id = bu.donation_id
+    LEFT JOIN organization o ON bu.issued_to_org_id = o.org_id
+    LEFT JOIN staff s_screener ON sc.staff_id = s_screener.staff_id
+    LEFT JOIN staff s_phleb ON d.phlebotomist_staff_id = s_phleb.staff_id
+    WHERE sc.donor_id = %s
+"""
+
+def parse_blood_type(blood_type):
+    """Splits 'AB+' into ('AB', '+'); returns None for anything that is not one of the 8 ABO/Rh types."""
+    blood_type = (blood_type or '').strip().replace(' ', '+') # an unencoded '+' arrives as a space
+    if len(blood_type) < 2 or blood_type[:-1] not in BLOOD_GROUPS or blood_type[-1] not in '+-': return None
+    return blood_type[:-1], blood_type[-1]
+
+def inventory_filters(args):
+    """Translates blood_type / status / expiry filters into (where clauses, values); raises ValueError for bad input."""
+    where, values = [], []
+    if args.get('blood_type'):
+        blood_type = parse_blood_type(args['blood_type'])
+        if not blood_type: raise ValueError(f"Unknown blood type: {args['blood_type']}")
+        where.append("blood_group = %s AND rh_factor = %s"); values.extend(blood_type)
+    if args.get('status'):
+        if args['status'] not in UNIT_STATUSES: raise ValueError(f"Unknown unit status: {args['status']}")
+        where.append("status = %s"); values.append(args['status'])
+    try:
+        expires_within = int(args['expires_within_days']) if args.get('expires_within_days') not in (None, '') else None
+        expires_after = datetime.strptime(args['expires_after'], '%Y-%m-%d').date() if args.get('expires_after') else None
+        expires_before = datetime.strptime(args['expires_before'], '%Y-%m-%d').date() if args.get('expires_before') else None
+    except (TypeError, ValueError): raise ValueError("expires_within_days must be an integer; expiry dates must be YYYY-MM-DD.")
+    if expires_within is not None: where.append("expiry_date <= %s"); values.append((datetime.now() + timedelta(days=expires_within)).date())
+    if expires_after: where.append("expiry_date >= %s"); values.append(expires_after)
+    if expires_before: where.append("expiry_date <= %s"); values.append(expires_before)
+    return where, values
+
+def inventory_page_query(args):
+    """Builds the keyset-paged GET /api/inventory query; returns (sql, params, limit) or raises ValueError for bad input."""
+    try:
+        limit = min(max(int(args.get('limit', INVENTORY_PAGE_SIZE)), 1), INVENTORY_MAX_PAGE_SIZE)
+        after_unit_id = int(args['cursor']) if args.get('cursor') else None
+    except ValueError: raise ValueError("limit and cursor must be integers.")
+    where, values = inventory_filters(args)
+    if after_unit_id: where.append("unit_id < %s"); values.append(after_unit_id)
+    query = INVENTORY_SELECT + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY unit_id DESC LIMIT %s"
+    return query, (*values, limit + 1), limit
+
+def inventory_page(units, limit, as_columns=False):
+    """Shapes the limit + 1 rows fetched by inventory_page_query into {units, next_cursor}; units as {columns, rows} if asked."""
+    next_cursor = units[limit - 1]['unit_id'] if len(units) > limit else None
+    units = units[:limit]
+    return {"units": columnar(units) if as_columns else units, "next_cursor": next_cursor}
+
+def screen_vitals(data):
+    """Parses a screening payload and applies the active eligibility ruleset; returns (vitals, is_eligible, notes).
+
+    Raises ValueError/TypeError when a vital is missing or not a number.
+    """
+    vitals = parse_vitals(data)
+    (is_eligible,), (final_notes,) = ACTIVE_RULESET.screen([vitals], [data.get('additional_notes')])
+    return vitals, is_eligible, final_notes
+
+def invalidate_donor_reports(*donor_ids):
+    """Drops cached /api/donors/<id>/report bodies after a screening, donation or unit change for those donors."""
+    keys = []
+    for donor_id in donor_ids:
+        try: keys.append(int(donor_id))
+        except (TypeError, ValueError): pass
+    DONOR_REPORT_CACHE.invalidate(*((key, as_columns, full) for key in keys for as_columns in (False, True) for full in (False, True)))
+    DB_ROUTER.pin(*(('donor', key) for key in keys)) # so the next report is not rebuilt (and cached) from a lagging replica
+
+def publish_unit_changes(status, units):
+    """Tells live dashboards that `units` ([{"unit_id", "blood_type"}, ...]) are now in `status`."""
+    if units: EVENTS.publish('units.updated', {"status": status, "units": [{"unit_id": u["unit_id"], "blood_type": u["blood_type"]} for u in units]})
+
+def request_staff_id(data):
+    """The acting staff member for the audit log: "staff_id" in the body or an X-Staff-Id header, if either is an integer."""
+    try: return int(data.get('staff_id') or request.headers.get('X-Staff-Id'))
+    except (TypeError, ValueError): return None
+
+def units_transitioned(result, source='batch', staff_id=None):
+    """Post-commit hook for a transition_units batch: audits each moved unit, drops the affected donor reports and publishes the change."""
+    updated = [r for r in result['results'] if r['outcome'] == 'updated']
+    AUDIT_LOG.record(*(unit_event(r['unit_id'], r['from'], result['status'], source, result['org_id'], staff_id=staff_id) for r in updated))
+    invalidate_donor_reports(*result['donor_ids'])
+    publish_unit_changes(result['status'], updated)
+
+def donation_created(donor_id, donation_id, unit_id, blood_type, expiry_date, staff_id=None):
+    """Post-commit hook for a new donation/unit: audits the unit, drops the donor's cached report and publishes unit.created."""
+    AUDIT_LOG.record(unit_event(unit_id, None, 'In Stock', 'donation', staff_id=staff_id))
+    invalidate_donor_reports(donor_id)
+    EVENTS.publish('unit.created', {"unit_id": unit_id, "donation_id": donation_id, "blood_type": blood_type, "status": 'In Stock', "expiry_date": expiry_date})
+
+METRICS.gauges += [
+    lambda: [(f"db_pool_{key}", f"Connection pool {key.replace('_', ' ')}.", value) for key, value in DB_POOL.metrics().items()],
+    lambda: [(f"cache_{name}_{key}", f"{name.replace('_', ' ').capitalize()} cache {key}.", value)
+             for name, cache in (('reference', REFERENCE_CACHE), ('donor_report', DONOR_REPORT_CACHE)) for key, value in cache.stats().items()],
+    lambda: [("events_subscribers", "Open /api/events streams.", EVENTS.stats()['subscribers'])],
+    lambda: [(f"db_reads_{key}", f"Reads routed: {key.replace('_', ' ')}.", value) for key, value in DB_ROUTER.stats()['reads'].items()],
+    lambda: [(f"db_replica{i}_lag_seconds", f"Replication lag of replica {i} (-1: unknown or stopped).", -1 if r.lag is None else r.lag)
+             for i, r in enumerate(DB_ROUTER.replicas)],
+    lambda: [(f"audit_events_{key}", f"Unit audit events {key}.", value) for key, value in AUDIT_LOG.stats().items() if key != 'last_error'],
+]
+
+EXPIRY_SWEEPER = ExpirySweeper(DB_POOL, SWEEP_CONFIG, on_units_changed=lambda result: units_transitioned(result, 'sweeper'))
+if SWEEP_CONFIG['in_process']: EXPIRY_SWEEPER.start()
+
+def reference_response(key, query, params=()):
+    """Read-through cached GET for dropdown reference data, with ETag/Last-Modified so browsers revalidate to a 304."""
+    entry = REFERENCE_CACHE.get(key)
+    if entry is None:
+        conn = get_db_connection()
+        if not conn: return jsonify({"error": "Database connection failed"}), 500
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(query, params)
+            body = app.json.dumps(cursor.fetchall())
+        except mysql.connector.Error as err: return jsonify({"error": f"Database error: {err.msg}"}), 500
+        finally:
+            if conn and conn.is_connected(): cursor.close(); conn.close()
+        entry = (body, hashlib.sha1(body.encode()).hexdigest(), datetime.now(timezone.utc).replace(microsecond=0))
+        REFERENCE_CACHE.set(key, entry)
+    body, etag, last_modified = entry
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag); response.last_modified = last_modified
+    response.cache_control.no_cache = True # always revalidate: unchanged data costs a 304, not a query
+    return response.make_conditional(request)
+
+def batch_response(results):
+    """Wraps per-row batch results: 201 when every row went in, 207 when some failed, 400 when none did."""
+    failed = sum(1 for r in results if 'error' in r)
+    status = 201 if not failed else 400 if failed == len(results) else 207
+    return jsonify({"inserted": len(results) - failed, "failed": failed, "results": results}), status
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -42,21 +246,61 @@ def add_donor():
         cursor.execute(sql, values)
         new_donor_id = cursor.lastrowid
         conn.commit()
+        if DONOR_INDEX is not None:
+            DONOR_INDEX.add({"donor_id": new_donor_id, "first_name": data.get('first_name'), "last_name": data.get('last_name'), "blood_type": blood_group_full, "phone_number": data.get('phone_number'), "email": email})
         return jsonify({"message": "Donor registered successfully!", "donor_id": new_donor_id}), 201
     except mysql.connector.Error as err:
         conn.rollback(); return jsonify({"error": f"Database error: {err.msg}"}), 500
     finally:
         if conn and conn.is_connected(): cursor.close(); conn.close()
 
+@app.route('/api/donors/batch', methods=['POST'])
+def add_donors_batch():
+    # Paper-captured drive registrations: JSON array or CSV upload, inserted in chunked executemany transactions.
+    try: rows = read_batch_rows(request, 'donors')
+    except ValueError as err: return jsonify({"error": str(err)}), 400
+    if not rows: return jsonify({"error": "No donors supplied."}), 400
+    if len(rows) > MAX_BATCH_ROWS: return jsonify({"error": f"At most {MAX_BATCH_ROWS} rows per batch."}), 413
+    results, batch = [], []
+    for i, row in enumerate(rows):
+        blood_type = parse_blood_type(row.get('blood_group') or 'O+')
+        missing = [k for k in ('first_name', 'last_name', 'date_of_birth') if not row.get(k)]
+        if missing: results.append({"row": i, "error": f"Missing {', '.join(missing)}"}); continue
+        if not blood_type: results.append({"row": i, "error": f"Unknown blood group: {row.get('blood_group')}"}); continue
+        results.append({"row": i})
+        batch.append((i, (row['first_name'], row['last_name'], row['date_of_birth'], blood_type[0], blood_type[1], row.get('gender') or None, row.get('phone_number') or None, row.get('email') or None)))
+    conn = get_db_connection()
+    if not conn: return jsonify({"error": "Database connection failed"}), 500
+    try:
+        sql = "INSERT INTO donors (first_name, last_name, date_of_birth, blood_group, rh_factor, gender, phone_number, email) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"
+        values_by_row = dict(batch)
+        for i, (donor_id, error) in insert_chunks(conn, sql, batch).items():
+            if error: results[i]["error"] = error; continue
+            results[i]["donor_id"] = donor_id
+            if DONOR_INDEX is not None:
+                first_name, last_name, _, blood_group, rh_factor, _, phone_number, email = values_by_row[i]
+                DONOR_INDEX.add({"donor_id": donor_id, "first_name": first_name, "last_name": last_name, "blood_type": blood_group + rh_factor, "phone_number": phone_number, "email": email})
+        return batch_response(results)
+    except mysql.connector.Error as err: return jsonify({"error": f"Database error: {err.msg}"}), 500
+    finally:
+        if conn and conn.is_connected(): conn.close()
+
 @app.route('/api/donors/search', methods=['GET'])
 def search_donors():
+    # ?q= ranks prefix + fuzzy matches on name, e-mail and phone; ?last_name= is the plain (prefix) last-name lookup.
+    search_text = request.args.get('q')
     last_name = request.args.get('last_name', '')
-    conn = get_db_connection()
+    try: limit = min(max(int(request.args.get('limit', SEARCH_DEFAULT_LIMIT)), 1), SEARCH_MAX_LIMIT)
+    except ValueError: return jsonify({"error": "limit must be an integer"}), 400
+    conn = get_db_connection(read_only=True)
     if not conn: return jsonify({"error": "Database connection failed"}), 500
     cursor = conn.cursor(dictionary=True)
     try:
+        if search_text is not None:
+            if DONOR_INDEX is not None and not DONOR_INDEX.loaded: DONOR_INDEX.load(cursor)
+            return jsonify(find_donors(cursor, search_text, limit, DONOR_INDEX)), 200
         query = "SELECT donor_id, first_name, last_name, CONCAT(blood_group, rh_factor) AS blood_type FROM donors WHERE last_name LIKE %s ORDER BY last_name, first_name"
-        cursor.execute(query, (f"%{last_name}%",))
+        cursor.execute(query, (escape_like(last_name) + '%',))
         return jsonify(cursor.fetchall()), 200
     except mysql.connector.Error as err: return jsonify({"error": f"Database error: {err.msg}"}), 500
     finally:
@@ -67,30 +311,79 @@ def add_screening():
     data = request.get_json()
     conn = get_db_connection()
     if not conn: return jsonify({"error": "Database connection failed"}), 500
-    is_eligible = True; notes_list = []
     try:
-        hemoglobin = float(data.get('hemoglobin', 0)); bp_systolic = int(data.get('bp_systolic', 0)); bp_diastolic = int(data.get('bp_diastolic', 0)); weight_kg = float(data.get('weight_kg', 0))
-        if hemoglobin < 12.5: is_eligible = False; notes_list.append("Low Hemoglobin")
-        if not (90 <= bp_systolic <= 180): is_eligible = False; notes_list.append("BP (Systolic) out of range")
-        if not (60 <= bp_diastolic <= 100): is_eligible = False; notes_list.append("BP (Diastolic) out of range")
-        if weight_kg < 50: is_eligible = False; notes_list.append("Weight below minimum")
-        final_notes = ", ".join(notes_list) if notes_list else "All vitals within range."
-        if data.get('additional_notes'): final_notes += f" | Staff Notes: {data.get('additional_notes')}"
+        (hemoglobin, bp_systolic, bp_diastolic, weight_kg), is_eligible, final_notes = screen_vitals(data)
     except (ValueError, TypeError): return jsonify({"error": "Invalid data for screening values (must be numbers)."}), 400
     cursor = conn.cursor()
     try:
-        sql = "INSERT INTO screenings (donor_id, staff_id, screening_date, hemoglobin, blood_pressure_systolic, blood_pressure_diastolic, weight_kg, is_eligible, notes) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)"
-        values = (data.get('donor_id'), data.get('staff_id'), datetime.now(), hemoglobin, bp_systolic, bp_diastolic, weight_kg, is_eligible, final_notes)
+        sql = "INSERT INTO screenings (donor_id, staff_id, screening_date, hemoglobin, blood_pressure_systolic, blood_pressure_diastolic, weight_kg, is_eligible, notes, rules_version) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+        values = (data.get('donor_id'), data.get('staff_id'), datetime.now(), hemoglobin, bp_systolic, bp_diastolic, weight_kg, is_eligible, final_notes, ACTIVE_RULESET.version)
         cursor.execute(sql, values)
         screening_id = cursor.lastrowid
+        record_screening(cursor, data.get('donor_id'), values[2], is_eligible)
         conn.commit()
+        invalidate_donor_reports(data.get('donor_id'))
         return jsonify({"message": f"Screening recorded. Donor is {'Eligible' if is_eligible else 'Not Eligible'}.", "screening_id": screening_id, "is_eligible": is_eligible, "notes": final_notes}), 201
     except mysql.connector.Error as err:
         conn.rollback(); return jsonify({"error": f"Database error: {err.msg}"}), 500
     finally:
         if conn and conn.is_connected(): cursor.close(); conn.close()
 
+@app.route('/api/screenings/batch', methods=['POST'])
+def add_screenings_batch():
+    # Same eligibility rules as add_screening, evaluated for the whole batch in one vectorized pass.
+    try: rows = read_batch_rows(request, 'screenings')
+    except ValueError as err: return jsonify({"error": str(err)}), 400
+    if not rows: return jsonify({"error": "No screenings supplied."}), 400
+    if len(rows) > MAX_BATCH_ROWS: return jsonify({"error": f"At most {MAX_BATCH_ROWS} rows per batch."}), 413
+    results, valid, now = [], [], datetime.now()
+    for i, row in enumerate(rows):
+        if not row.get('donor_id') or not row.get('staff_id'): results.append({"row": i, "error": "donor_id and staff_id are required"}); continue
+        try: vitals = parse_vitals(row)
+        except (ValueError, TypeError): results.append({"row": i, "error": "Invalid data for screening values (must be numbers)."}); continue
+        results.append({"row": i}); valid.append((i, row, vitals))
+    eligible, notes = ACTIVE_RULESET.screen([vitals for _, _, vitals in valid], [row.get('additional_notes') for _, row, _ in valid])
+    batch = []
+    for (i, row, vitals), is_eligible, final_notes in zip(valid, eligible, notes):
+        results[i].update({"is_eligible": is_eligible, "notes": final_notes})
+        batch.append((i, (row['donor_id'], row['staff_id'], row.get('screening_date') or now, *vitals, is_eligible, final_notes, ACTIVE_RULESET.version)))
+    conn = get_db_connection()
+    if not conn: return jsonify({"error": "Database connection failed"}), 500
+    try:
+        sql = "INSERT INTO screenings (donor_id, staff_id, screening_date, hemoglobin, blood_pressure_systolic, blood_pressure_diastolic, weight_kg, is_eligible, notes, rules_version) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+        for i, (screening_id, error) in insert_chunks(conn, sql, batch).items():
+            if error: results[i]["error"] = error
+            else: results[i]["screening_id"] = screening_id
+        screened = {rows[i]['donor_id'] for i, _ in batch if 'screening_id' in results[i]}
+        if screened: refresh_recall(conn, screened, RECALL_CONFIG['deferral_days']) # latest screening may have changed
+        invalidate_donor_reports(*screened)
+        return batch_response(results)
+    except mysql.connector.Error as err: return jsonify({"error": f"Database error: {err.msg}"}), 500
+    finally:
+        if conn and conn.is_connected(): conn.close()
+
+@app.route('/api/screenings/rules', methods=['GET'])
+def get_screening_rules():
+    return jsonify({"active_version": ACTIVE_RULESET.version, "rulesets": [r.describe() for r in RULESETS.values()]}), 200
+
+@app.route('/api/screenings/reevaluate', methods=['POST'])
+def reevaluate_screening_history():
+    # Dry run unless {"apply": true}; re-screens stored vitals under the given (default: active) ruleset version.
+    data = request.get_json(silent=True) or {}
+    ruleset = RULESETS.get(data.get('version') or ACTIVE_RULESET.version)
+    if not ruleset: return jsonify({"error": f"Unknown ruleset version: {data.get('version')}"}), 400
+    conn = get_db_connection()
+    if not conn: return jsonify({"error": "Database connection failed"}), 500
+    try:
+        stats = reevaluate_screenings(conn, ruleset, apply=bool(data.get('apply')))
+        if stats['applied'] and stats['changed']: refresh_recall(conn, deferral_days=RECALL_CONFIG['deferral_days'])
+        return jsonify(stats), 200
+    except mysql.connector.Error as err: return jsonify({"error": f"Database error: {err.msg}"}), 500
+    finally:
+        if conn and conn.is_connected(): conn.close()
+
 @app.route('/api/donations', methods=['POST'])
+@idempotent(IDEMPOTENCY_STORE) # retries with the same Idempotency-Key get the first response back
 def add_donation():
     data = request.get_json()
     if not all(data.get(k) for k in ['donor_id', 'screening_id', 'staff_id']):
@@ -100,16 +393,25 @@ def add_donation():
     cursor = conn.cursor()
     try:
         collection_date = datetime.now()
-        sql_donation = "INSERT INTO donations (donor_id, screening_id, phlebotomist_staff_id, donation_date, collection_site) VALUES (%s, %s, %s, %s, %s)"
-        cursor.execute(sql_donation, (data.get('donor_id'), data.get('screening_id'), data.get('staff_id'), collection_date, 'Main Center'))
+        cursor.execute(DONATION_INSERT, (data.get('donor_id'), data.get('screening_id'), data.get('staff_id'), collection_date, 'Main Center'))
         donation_id = cursor.lastrowid
         expiry_date = collection_date + timedelta(days=42)
         blood_group_full = data.get('blood_group', 'O+')
-        sql_unit = "INSERT INTO blood_units (donation_id, blood_group, rh_factor, collection_date, expiry_date, status) VALUES (%s, %s, %s, %s, %s, 'In Stock')"
-        cursor.execute(sql_unit, (donation_id, blood_group_full[:-1], blood_group_full[-1], collection_date.date(), expiry_date.date()))
+        cursor.execute(UNIT_INSERT, (donation_id, blood_group_full[:-1], blood_group_full[-1], collection_date.date(), expiry_date.date()))
         unit_id = cursor.lastrowid
+        record_unit_added(cursor, blood_group_full[:-1], blood_group_full[-1])
+        for sql, params in recall_donation_statements(data.get('donor_id'), collection_date, RECALL_CONFIG['deferral_days']): cursor.execute(sql, params)
         conn.commit()
+        donation_created(data.get('donor_id'), donation_id, unit_id, blood_group_full, expiry_date.date(), request_staff_id(data))
         return jsonify({"message": "Donation and Blood Unit created successfully!", "donation_id": donation_id, "unit_id": unit_id}), 201
+    except mysql.connector.IntegrityError as err:
+        conn.rollback()
+        if err.errno != 1062: return jsonify({"error": f"Transaction failed: {err.msg}"}), 500
+        # UNIQUE(screening_id): a retry from another worker, or a second collection against one screening.
+        cursor.execute("SELECT d.donation_id, bu.unit_id FROM donations d LEFT JOIN blood_units bu ON bu.donation_id = d.donation_id WHERE d.screening_id = %s", (data.get('screening_id'),))
+        existing = cursor.fetchone()
+        if not existing: return jsonify({"error": f"Transaction failed: {err.msg}"}), 500
+        return jsonify({"error": "This screening already has a donation.", "donation_id": existing[0], "unit_id": existing[1]}), 409
     except mysql.connector.Error as err:
         conn.rollback(); return jsonify({"error": f"Transaction failed: {err.msg}"}), 500
     finally:
@@ -117,13 +419,16 @@ def add_donation():
 
 @app.route('/api/inventory', methods=['GET'])
 def get_inventory():
-    conn = get_db_connection()
+    # Keyset pagination on unit_id (newest first): pass the returned next_cursor back as ?cursor= for the next page.
+    try: query, params, limit = inventory_page_query(request.args)
+    except ValueError as err: return jsonify({"error": str(err)}), 400
+
+    conn = get_db_connection(read_only=True)
     if not conn: return jsonify({"error": "Database connection failed"}), 500
     cursor = conn.cursor(dictionary=True)
     try:
-        query = "SELECT unit_id, CONCAT(blood_group, rh_factor) AS blood_type, status FROM blood_units ORDER BY unit_id DESC"
-        cursor.execute(query)
-        return jsonify(cursor.fetchall()), 200
+        cursor.execute(query, params)
+        return jsonify(inventory_page(cursor.fetchall(), limit, wants_columns(request.args))), 200
     except mysql.connector.Error as err: return jsonify({"error": f"Database error: {err.msg}"}), 500
     finally:
         if conn and conn.is_connected(): cursor.close(); conn.close()
@@ -134,97 +439,224 @@ def update_unit_status(unit_id):
     new_status = data.get('status')
     org_id = data.get('org_id') or None # Get the org_id if it exists
     if not new_status: return jsonify({"error": "New status is required"}), 400
+    if new_status not in UNIT_STATUSES: return jsonify({"error": f"Unknown unit status: {new_status}"}), 400
     
     conn = get_db_connection()
     if not conn: return jsonify({"error": "Database connection failed"}), 500
     cursor = conn.cursor()
     try:
+        # Lock the row to read the old status, so the summary counters move in the same transaction.
+        cursor.execute("SELECT bu.blood_group, bu.rh_factor, bu.status, d.donor_id FROM blood_units bu JOIN donations d ON bu.donation_id = d.donation_id WHERE bu.unit_id = %s FOR UPDATE OF bu", (unit_id,))
+        unit = cursor.fetchone()
+        if not unit: conn.rollback(); return jsonify({"error": "Unit ID not found"}), 404
+        if unit[2] != new_status and transition_error(unit[2], new_status): conn.rollback(); return jsonify({"error": transition_error(unit[2], new_status)}), 409
         sql = "UPDATE blood_units SET status = %s, issued_to_org_id = %s WHERE unit_id = %s"
         values = (new_status, org_id if new_status == 'Issued' else None, unit_id)
         
         cursor.execute(sql, values)
-        if cursor.rowcount == 0: return jsonify({"error": "Unit ID not found"}), 404
+        record_status_change(cursor, unit[0], unit[1], unit[2], new_status)
         conn.commit()
+        if unit[2] != new_status: AUDIT_LOG.record(unit_event(unit_id, unit[2], new_status, 'api', values[1], staff_id=request_staff_id(data)))
+        invalidate_donor_reports(unit[3])
+        EVENTS.publish('unit.updated', {"unit_id": unit_id, "blood_type": f"{unit[0]}{unit[1]}", "status": new_status, "previous_status": unit[2]})
         return jsonify({"message": f"Unit status updated to {new_status}"}), 200
     except mysql.connector.Error as err:
         conn.rollback(); return jsonify({"error": f"Database error: {err.msg}"}), 500
     finally:
         if conn and conn.is_connected(): cursor.close(); conn.close()
 
+@app.route('/api/units/<int:unit_id>/trace', methods=['GET'])
+def get_unit_trace(unit_id):
+    # Unit -> donation -> screening -> donor, with the unit's lifecycle events (see audit_log.py).
+    conn = get_db_connection()
+    if not conn: return jsonify({"error": "Database connection failed"}), 500
+    try:
+        trace = trace_unit(conn, unit_id, wants_full_history(request.args)) # ?history=full: archived units too
+        if trace is None: return jsonify({"error": "Unit ID not found"}), 404
+        return jsonify(trace), 200
+    except mysql.connector.Error as err: return jsonify({"error": f"Database error: {err.msg}"}), 500
+    finally:
+        if conn and conn.is_connected(): conn.close()
+
+@app.route('/api/inventory/transitions', methods=['POST'])
+def transition_inventory():
+    # Batch issue/discard/quarantine: {"status", "org_id"?, "unit_ids": [...] | "filter": {blood_type, status, expires_*}, "all_or_nothing"?}
+    data = request.get_json(silent=True) or {}
+    new_status = data.get('status')
+    org_id = data.get('org_id') or None
+    unit_ids, filters = data.get('unit_ids'), data.get('filter')
+    if new_status not in UNIT_STATUSES: return jsonify({"error": f"Unknown unit status: {new_status}"}), 400
+    if new_status == 'Issued' and not org_id: return jsonify({"error": "org_id is required when issuing units"}), 400
+    if bool(unit_ids) == bool(filters): return jsonify({"error": "Provide either a non-empty unit_ids list or a filter"}), 400
+    where, values = None, ()
+    if unit_ids:
+        if not isinstance(unit_ids, list) or not all(isinstance(u, int) and not isinstance(u, bool) for u in unit_ids):
+            return jsonify({"error": "unit_ids must be a list of integers"}), 400
+        unit_ids = list(dict.fromkeys(unit_ids))
+        if len(unit_ids) > MAX_TRANSITION_UNITS: return jsonify({"error": f"At most {MAX_TRANSITION_UNITS} units per request"}), 400
+    else:
+        if not isinstance(filters, dict): return jsonify({"error": "filter must be an object"}), 400
+        try: where, values = inventory_filters(filters)
+        except ValueError as err: return jsonify({"error": str(err)}), 400
+        if not where: return jsonify({"error": "filter must restrict blood_type, status or expiry"}), 400
+
+    conn = get_db_connection()
+    if not conn: return jsonify({"error": "Database connection failed"}), 500
+    try:
+        result = transition_units(conn, new_status, org_id, unit_ids=unit_ids or None, where=where, values=values, all_or_nothing=bool(data.get('all_or_nothing')))
+        units_transitioned(result, 'batch', request_staff_id(data)); result.pop('donor_ids')
+        return jsonify(result), 409 if data.get('all_or_nothing') and result['failed'] else 200
+    except mysql.connector.Error as err: return jsonify({"error": f"Database error: {err.msg}"}), 500
+    finally:
+        if conn and conn.is_connected(): conn.close()
+
 @app.route('/api/reports/inventory', methods=['GET'])
 def get_inventory_report():
-    conn = get_db_connection()
+    conn = get_db_connection(read_only=True)
     if not conn: return jsonify({"error": "Database connection failed"}), 500
     cursor = conn.cursor(dictionary=True)
     try:
-        query = "SELECT CONCAT(blood_group, rh_factor) AS blood_type, status, COUNT(*) as count FROM blood_units GROUP BY blood_type, status ORDER BY blood_type, status;"
-        cursor.execute(query)
+        cursor.execute(SUMMARY_QUERY) # maintained by add_donation / update_unit_status, see inventory_summary.py
         return jsonify(cursor.fetchall()), 200
     except mysql.connector.Error as err: return jsonify({"error": f"Database error: {err.msg}"}), 500
     finally:
         if conn and conn.is_connected(): cursor.close(); conn.close()
 
+@app.route('/api/reports/forecast', methods=['GET'])
+def get_forecast_report():
+    # Days of supply, projected expiry losses and shortfalls per blood type over ?horizon= days (see forecast.py).
+    try: horizon = int(request.args.get('horizon', FORECAST_CONFIG['horizon_days']))
+    except ValueError: return jsonify({"error": "horizon must be an integer"}), 400
+    if not 1 <= horizon <= FORECAST_CONFIG['max_horizon_days']: return jsonify({"error": f"horizon must be between 1 and {FORECAST_CONFIG['max_horizon_days']}"}), 400
+    conn = get_db_connection()
+    if not conn: return jsonify({"error": "Database connection failed"}), 500
+    try:
+        return jsonify(FORECASTER.forecast(conn, horizon)), 200
+    except mysql.connector.Error as err: return jsonify({"error": f"Database error: {err.msg}"}), 500
+    finally:
+        if conn and conn.is_connected(): conn.close()
+
+@app.route('/api/reports/inventory/reconcile', methods=['GET', 'POST'])
+def reconcile_inventory_report():
+    # GET reports drift between inventory_summary and blood_units; POST also repairs it.
+    conn = get_db_connection()
+    if not conn: return jsonify({"error": "Database connection failed"}), 500
+    try:
+        drift = reconcile_inventory_summary(conn, repair=request.method == 'POST')
+        return jsonify({"drift": drift, "repaired": request.method == 'POST' and bool(drift)}), 200
+    except mysql.connector.Error as err: return jsonify({"error": f"Database error: {err.msg}"}), 500
+    finally:
+        if conn and conn.is_connected(): conn.close()
+
+@app.route('/api/inventory/expiry', methods=['GET'])
+def get_expiry_status():
+    # Near-expiry alerts (?days=, default SWEEP_CONFIG['alert_days']) plus the last sweep run in this process.
+    try: days = int(request.args.get('days', SWEEP_CONFIG['alert_days']))
+    except ValueError: return jsonify({"error": "days must be an integer"}), 400
+    conn = get_db_connection()
+    if not conn: return jsonify({"error": "Database connection failed"}), 500
+    try:
+        return jsonify({"near_expiry": near_expiry_alerts(conn, days), "alert_days": days, "sweeper": EXPIRY_SWEEPER.status()}), 200
+    except mysql.connector.Error as err: return jsonify({"error": f"Database error: {err.msg}"}), 500
+    finally:
+        if conn and conn.is_connected(): conn.close()
+
+@app.route('/api/inventory/expiry/sweep', methods=['POST'])
+def run_expiry_sweep():
+    result = EXPIRY_SWEEPER.run_once()
+    if EXPIRY_SWEEPER.last_error: return jsonify({"error": EXPIRY_SWEEPER.last_error}), 500
+    if result is None: return jsonify({"error": "Another expiry sweep is already running"}), 409
+    return jsonify(result), 200
+
+@app.route('/api/archive/run', methods=['POST'])
+def run_archival():
+    # One bounded pass of archive.py (also runnable as `python archive.py`); donor reports of the moved records are dropped.
+    conn = get_db_connection()
+    if not conn: return jsonify({"error": "Database connection failed"}), 500
+    try:
+        result = run_archive(conn, ARCHIVE_CONFIG)
+        if result is None: return jsonify({"error": "Another archival job is already running"}), 409
+    except mysql.connector.Error as err: return jsonify({"error": f"Database error: {err.msg}"}), 500
+    finally:
+        if conn and conn.is_connected(): conn.close()
+    invalidate_donor_reports(*result.pop('donor_ids'))
+    return jsonify(result), 200
+
 @app.route('/api/donors/<int:donor_id>/report', methods=['GET'])
 def get_donor_report(donor_id):
-    conn = get_db_connection()
+    # Serialized once and cached per donor; add_screening/add_donation/update_unit_status invalidate the entry.
+    cache_key = (donor_id, wants_columns(request.args), wants_full_history(request.args)) # ?format=columns: history as {columns, rows}; ?history=full: archived records too
+    body = DONOR_REPORT_CACHE.get(cache_key)
+    if body is not None: return app.response_class(body, mimetype='application/json'), 200
+    generation = DONOR_REPORT_CACHE.generation(cache_key) # taken before reading, so a write committed meanwhile is not cached over
+    conn = get_db_connection(read_only=True, pin_keys=[('donor', donor_id)])
     if not conn: return jsonify({"error": "Database connection failed"}), 500
     cursor = conn.cursor(dictionary=True)
     try:
         cursor.execute("SELECT donor_id, first_name, last_name, date_of_birth, CONCAT(blood_group, rh_factor) as blood_type, gender, phone_number, email FROM donors WHERE donor_id = %s", (donor_id,))
         donor_details = cursor.fetchone()
         if not donor_details: return jsonify({"error": "Donor not found"}), 404
-        if donor_details.get('date_of_birth'): donor_details['date_of_birth'] = donor_details['date_of_birth'].strftime('%Y-%m-%d')
-        query = """
-            SELECT sc.screening_id, sc.screening_date, sc.is_eligible, sc.notes, s_screener.first_name as screener_fname, s_screener.last_name as screener_lname,
-                   d.donation_id, d.donation_date, s_phleb.first_name as phleb_fname, s_phleb.last_name as phleb_lname,
-                   bu.unit_id, bu.status as unit_status, bu.expiry_date, o.name as issued_to_org
-            FROM screenings sc
-            LEFT JOIN donations d ON sc.screening_id = d.screening_id
-            LEFT JOIN blood_units bu ON d.donation_id = bu.donation_id
-            LEFT JOIN organizations o ON bu.issued_to_org_id = o.org_id
-            LEFT JOIN staff s_screener ON sc.staff_id = s_screener.staff_id
-            LEFT JOIN staff s_phleb ON d.phlebotomist_staff_id = s_phleb.staff_id
-            WHERE sc.donor_id = %s ORDER BY sc.screening_date DESC;
-        """
-        cursor.execute(query, (donor_id,))
+        # Whole history in one round trip; screenings(donor_id, screening_date) and the donations covering index drive it.
+        # Donation chains are archived whole, so the hot and archived halves never need joining to each other.
+        if cache_key[2]: query, params = with_archive(DONOR_HISTORY_SELECT, (donor_id,))
+        else: query, params = DONOR_HISTORY_SELECT.format(**HOT_TABLES), (donor_id,)
+        cursor.execute(query + " ORDER BY screening_date DESC", params)
         history = cursor.fetchall()
-        for item in history:
-            for key, value in item.items():
-                if isinstance(value, (datetime,)): item[key] = value.strftime('%Y-%m-%d %H:%M:%S')
-                if isinstance(value, (datetime.date,)): item[key] = value.strftime('%Y-%m-%d')
-        return jsonify({"donor_details": donor_details, "history": history}), 200
+        body = app.json.dumps({"donor_details": donor_details, "history": columnar(history) if cache_key[1] else history})
+        DONOR_REPORT_CACHE.set(cache_key, body, generation)
+        return app.response_class(body, mimetype='application/json'), 200
     except mysql.connector.Error as err: return jsonify({"error": f"Database error: {err.msg}"}), 500
     finally:
         if conn and conn.is_connected(): cursor.close(); conn.close()
 
-@app.route('/api/roles', methods=['GET'])
-def get_roles():
-    conn = get_db_connection()
+@app.route('/api/recall', methods=['GET'])
+def get_recall_list():
+    # Donors due to donate again (deferral over, latest screening eligible): ?blood_type=O-,A- &limit= &cursor=; shortage types first.
+    try: types = parse_blood_types(request.args.get('blood_type'))
+    except ValueError as err: return jsonify({"error": str(err)}), 400
+    try: limit = min(max(int(request.args.get('limit', RECALL_CONFIG['page_size'])), 1), RECALL_CONFIG['max_page_size'])
+    except ValueError: return jsonify({"error": "limit must be an integer"}), 400
+    conn = get_db_connection(read_only=True)
     if not conn: return jsonify({"error": "Database connection failed"}), 500
-    cursor = conn.cursor(dictionary=True)
     try:
-        cursor.execute("SELECT role_id, role_name FROM roles ORDER BY role_name")
-        return jsonify(cursor.fetchall()), 200
+        return jsonify(recall_page(conn, types, limit, request.args.get('cursor'))), 200
+    except ValueError as err: return jsonify({"error": str(err)}), 400
     except mysql.connector.Error as err: return jsonify({"error": f"Database error: {err.msg}"}), 500
     finally:
-        if conn and conn.is_connected(): cursor.close(); conn.close()
+        if conn and conn.is_connected(): conn.close()
+
+@app.route('/api/recall/export', methods=['GET'])
+def export_recall_list():
+    # The whole recall list for an SMS/e-mail campaign, streamed as NDJSON or CSV (?format=), shortage types first like /api/recall.
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS: return jsonify({"error": "format must be 'ndjson' or 'csv'"}), 400
+    try: types = parse_blood_types(request.args.get('blood_type'))
+    except ValueError as err: return jsonify({"error": str(err)}), 400
+    conn = get_db_connection(read_only=True)
+    if not conn: return jsonify({"error": "Database connection failed"}), 500
+    headers = {"Content-Disposition": f"attachment; filename=recall.{fmt}"}
+    return Response(stream_with_context(iter_recall_export(conn, types, fmt)), mimetype=EXPORT_FORMATS[fmt], headers=headers)
+
+@app.route('/api/roles', methods=['GET'])
+def get_roles():
+    return reference_response('roles', "SELECT role_id, role_name FROM roles ORDER BY role_name")
         
 @app.route('/api/staff', methods=['GET', 'POST'])
 def handle_staff():
+    if request.method == 'GET':
+        query = "SELECT s.staff_id, s.first_name, s.last_name, s.employee_number, s.role_id, r.role_name FROM staff s JOIN roles r ON s.role_id = r.role_id WHERE s.is_active = 1 ORDER BY s.last_name, s.first_name"
+        return reference_response('staff', query)
     conn = get_db_connection()
     if not conn: return jsonify({"error": "Database connection failed"}), 500
     cursor = conn.cursor(dictionary=True)
     try:
-        if request.method == 'GET':
-            query = "SELECT s.staff_id, s.first_name, s.last_name, s.employee_number, s.role_id, r.role_name FROM staff s JOIN roles r ON s.role_id = r.role_id WHERE s.is_active = 1 ORDER BY s.last_name, s.first_name"
-            cursor.execute(query)
-            return jsonify(cursor.fetchall()), 200
-        elif request.method == 'POST':
+        if request.method == 'POST':
             data = request.get_json()
             sql = "INSERT INTO staff (first_name, last_name, employee_number, role_id) VALUES (%s, %s, %s, %s)"
             cursor.execute(sql, (data.get('first_name'), data.get('last_name'), data.get('employee_number'), data.get('role_id')))
             staff_id = cursor.lastrowid
             conn.commit()
+            REFERENCE_CACHE.invalidate('staff')
             return jsonify({"message": "Staff member added successfully!", "staff_id": staff_id}), 201
     except mysql.connector.Error as err:
         if conn.is_connected(): conn.rollback()
@@ -244,6 +676,7 @@ def update_staff_role(staff_id):
         if not cursor.fetchone(): return jsonify({"error": "Staff member not found"}), 404
         cursor.execute("UPDATE staff SET role_id = %s WHERE staff_id = %s", (new_role_id, staff_id))
         conn.commit()
+        REFERENCE_CACHE.invalidate('staff')
         return jsonify({"message": "Staff role updated successfully"}), 200
     except mysql.connector.Error as err:
         if conn.is_connected(): conn.rollback()
@@ -253,31 +686,23 @@ def update_staff_role(staff_id):
 
 @app.route('/api/tasks', methods=['GET'])
 def get_tasks():
-    conn = get_db_connection()
-    if not conn: return jsonify({"error": "Database connection failed"}), 500
-    cursor = conn.cursor(dictionary=True)
-    try:
-        cursor.execute("SELECT task_id, task_name FROM tasks ORDER BY task_name")
-        return jsonify(cursor.fetchall()), 200
-    except mysql.connector.Error as err: return jsonify({"error": f"Database error: {err.msg}"}), 500
-    finally:
-        if conn and conn.is_connected(): cursor.close(); conn.close()
+    return reference_response('tasks', "SELECT task_id, task_name FROM tasks ORDER BY task_name")
 
 @app.route('/api/staff/<int:staff_id>/tasks', methods=['GET', 'POST'])
 def handle_staff_tasks(staff_id):
+    if request.method == 'GET':
+        query = "SELECT t.task_id, t.task_name FROM tasks t JOIN staff_tasks st ON t.task_id = st.task_id WHERE st.staff_id = %s"
+        return reference_response(f"staff_tasks:{staff_id}", query, (staff_id,))
     conn = get_db_connection()
     if not conn: return jsonify({"error": "Database connection failed"}), 500
     cursor = conn.cursor(dictionary=True)
     try:
-        if request.method == 'GET':
-            query = "SELECT t.task_id, t.task_name FROM tasks t JOIN staff_tasks st ON t.task_id = st.task_id WHERE st.staff_id = %s"
-            cursor.execute(query, (staff_id,))
-            return jsonify(cursor.fetchall()), 200
-        elif request.method == 'POST':
+        if request.method == 'POST':
             data = request.get_json()
             sql = "INSERT INTO staff_tasks (staff_id, task_id) VALUES (%s, %s)"
             cursor.execute(sql, (staff_id, data.get('task_id')))
             conn.commit()
+            REFERENCE_CACHE.invalidate(f"staff_tasks:{staff_id}")
             return jsonify({"message": "Task assigned"}), 201
     except mysql.connector.Error as err:
         if conn.is_connected(): conn.rollback()
@@ -294,6 +719,7 @@ def remove_staff_task(staff_id, task_id):
         sql = "DELETE FROM staff_tasks WHERE staff_id = %s AND task_id = %s"
         cursor.execute(sql, (staff_id, task_id))
         conn.commit()
+        REFERENCE_CACHE.invalidate(f"staff_tasks:{staff_id}")
         return jsonify({"message": "Task removed"}), 200
     except mysql.connector.Error as err:
         if conn.is_connected(): conn.rollback()
@@ -301,17 +727,69 @@ def remove_staff_task(staff_id, task_id):
     finally:
         if conn and conn.is_connected(): cursor.close(); conn.close()
 
+@app.route('/api/db/pool', methods=['GET'])
+def get_pool_metrics():
+    return jsonify({**DB_POOL.metrics(), "routing": DB_ROUTER.stats()}), 200
+
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify({"reference": REFERENCE_CACHE.stats(), "donor_reports": DONOR_REPORT_CACHE.stats(), "events": EVENTS.stats(),
+                    "idempotency": IDEMPOTENCY_STORE.stats(), "audit_log": AUDIT_LOG.stats()}), 200
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    # Prometheus text format: request/SQL latency histograms, row counts, slow queries, pool/cache/event gauges.
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4'), 200
+
+@app.route('/api/debug/profile', methods=['GET'])
+def get_profile():
+    # Opt-in (METRICS_CONFIG['profiler_enabled']): samples all threads for ?seconds= and returns folded stacks for flamegraph.pl / speedscope.
+    if PROFILER is None: return jsonify({"error": "Profiler is disabled"}), 404
+    try: seconds = min(max(float(request.args.get('seconds', 10)), 0.1), METRICS_CONFIG['max_profile_seconds'])
+    except ValueError: return jsonify({"error": "seconds must be a number"}), 400
+    folded = PROFILER.profile(seconds)
+    if folded is None: return jsonify({"error": "A profile is already being captured"}), 409
+    return Response(folded, mimetype='text/plain'), 200
+
+# --- BULK EXPORTS (streamed, constant memory) ---
+EXPORT_QUERIES = {
+    'inventory': "SELECT unit_id, donation_id, CONCAT(blood_group, rh_factor) AS blood_type, status, collection_date, expiry_date, issued_to_org_id FROM blood_units ORDER BY unit_id",
+    'donors': "SELECT donor_id, first_name, last_name, date_of_birth, CONCAT(blood_group, rh_factor) AS blood_type, gender, phone_number, email, registration_date FROM donors ORDER BY donor_id",
+    'blood_requests': "SELECT r.request_id, r.org_id, o.name AS org_name, r.patient_name, CONCAT(r.blood_group, r.rh_factor) AS blood_type, r.quantity, r.status, r.request_date FROM blood_requests r JOIN organization o ON r.org_id = o.org_id ORDER BY r.request_id",
+}
+
+@app.route('/api/export/<dataset>', methods=['GET'])
+def export_dataset(dataset):
+    fmt = request.args.get('format', 'ndjson')
+    if dataset not in EXPORT_QUERIES: return jsonify({"error": f"Unknown export: {dataset}"}), 404
+    if fmt not in EXPORT_FORMATS: return jsonify({"error": "format must be 'ndjson' or 'csv'"}), 400
+    conn = get_db_connection()
+    if not conn: return jsonify({"error": "Database connection failed"}), 500
+    cursor = conn.cursor() # unbuffered: rows are pulled from the server as the response is written
+    try:
+        cursor.execute(EXPORT_QUERIES[dataset])
+    except mysql.connector.Error as err:
+        cursor.close(); return jsonify({"error": f"Database error: {err.msg}"}), 500
+    def generate():
+        try:
+            yield from iter_export(cursor, fmt)
+        finally:
+            # An aborted download leaves unread rows; the pool discards that connection on release.
+            try: cursor.close()
+            except mysql.connector.Error: pass
+    headers = {"Content-Disposition": f"attachment; filename={dataset}.{fmt}"}
+    return Response(stream_with_context(generate()), mimetype=EXPORT_FORMATS[fmt], headers=headers)
+
 # --- NEW: ORGANIZATION ENDPOINTS ---
 @app.route('/api/organizations', methods=['GET', 'POST'])
 def handle_organizations():
+    if request.method == 'GET':
+        return reference_response('organizations', "SELECT org_id, name, org_type FROM organization ORDER BY name")
     conn = get_db_connection()
     if not conn: return jsonify({"error": "Database connection failed"}), 500
     cursor = conn.cursor(dictionary=True)
     try:
-        if request.method == 'GET':
-            cursor.execute("SELECT org_id, name, org_type FROM organization ORDER BY name")
-            return jsonify(cursor.fetchall()), 200
-        elif request.method == 'POST':
+        if request.method == 'POST':
             data = request.get_json()
             if not data.get('name') or not data.get('org_type'):
                 return jsonify({"error": "Name and Type are required"}), 400
@@ -320,6 +798,7 @@ def handle_organizations():
             cursor.execute(sql, values)
             org_id = cursor.lastrowid
             conn.commit()
+            REFERENCE_CACHE.invalidate('organizations')
             return jsonify({"message": "Organization registered successfully", "org_id": org_id}), 201
     except mysql.connector.Error as err:
         if conn.is_connected(): conn.rollback()
@@ -330,24 +809,14 @@ def handle_organizations():
 # --- NEW: BLOOD REQUEST ENDPOINTS ---
 @app.route('/api/blood_requests', methods=['GET', 'POST'])
 def handle_blood_requests():
-    conn = get_db_connection()
+    conn = get_db_connection(read_only=request.method == 'GET')
     if not conn: return jsonify({"error": "Database connection failed"}), 500
     cursor = conn.cursor(dictionary=True)
     try:
         if request.method == 'GET':
-            query = """
-                SELECT r.request_id, r.status, r.quantity, r.request_date, o.name as org_name,
-                       CONCAT(r.blood_group, r.rh_factor) as blood_type
-                FROM blood_requests r
-                JOIN organization o ON r.org_id = o.org_id
-                ORDER BY r.request_date DESC
-            """
-            cursor.execute(query)
+            cursor.execute(BLOOD_REQUEST_SELECT + " ORDER BY r.request_date DESC")
             requests = cursor.fetchall()
-            
-            for req in requests: # Convert datetime to string
-                if req.get('request_date'): req['request_date'] = req['request_date'].strftime('%Y-%m-%d %H:%M')
-            return jsonify(requests), 200
+            return jsonify(columnar(requests) if wants_columns(request.args) else requests), 200
         elif request.method == 'POST':
             data = request.get_json()
             if not all(data.get(k) for k in ['org_id', 'blood_group', 'quantity']):
@@ -358,6 +827,8 @@ def handle_blood_requests():
             cursor.execute(sql, values)
             request_id = cursor.lastrowid
             conn.commit()
+            cursor.execute(BLOOD_REQUEST_SELECT + " WHERE r.request_id = %s", (request_id,))
+            for created in cursor.fetchall(): EVENTS.publish('request.created', created)
             return jsonify({"message": "Blood request submitted successfully", "request_id": request_id}), 201
     except mysql.connector.Error as err:
         if conn.is_connected(): conn.rollback()
@@ -366,5 +837,33 @@ def handle_blood_requests():
         if conn and conn.is_connected(): cursor.close(); conn.close()
 
 
+@app.route('/api/blood_requests/<int:request_id>/allocate', methods=['POST'])
+def allocate_blood_request(request_id):
+    # {"mode": "issue" | "reserve", "allow_substitutes": true}; all-or-nothing, FEFO, see allocation.py
+    data = request.get_json(silent=True) or {}
+    conn = get_db_connection()
+    if not conn: return jsonify({"error": "Database connection failed"}), 500
+    try:
+        result = allocate_request(conn, request_id, data.get('mode', 'issue'), data.get('allow_substitutes', True) is not False)
+    except AllocationError as err: return jsonify({"error": str(err)}), err.status
+    except mysql.connector.Error as err: return jsonify({"error": f"Database error: {err.msg}"}), 500
+    finally:
+        if conn and conn.is_connected(): conn.close()
+    unit_status = ALLOCATION_MODES[data.get('mode', 'issue')][0]
+    AUDIT_LOG.record(*(unit_event(u['unit_id'], u['from'], unit_status, 'allocation', result['org_id'] if unit_status == 'Issued' else None, request_id,
+                                  request_staff_id(data)) for u in result['units']))
+    invalidate_donor_reports(*result.pop('donor_ids'))
+    publish_unit_changes(unit_status, result['units'])
+    EVENTS.publish('request.updated', {"request_id": request_id, "status": result['status']})
+    return jsonify(result), 200
+
+@app.route('/api/events', methods=['GET'])
+def stream_events():
+    # Server-Sent Events: unit.created, unit.updated, units.updated, request.created, request.updated, resync.
+    try: last_event_id = int(request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or 0) or None
+    except ValueError: last_event_id = None
+    return Response(stream_with_context(iter_sse(EVENTS.subscribe(last_event_id))), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
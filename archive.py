@@ -0,0 +1,190 @@
+"""Hot/cold archival: closed records older than `hot_days` move to yearly-partitioned archive_* tables.
+
+What moves:
+  * Issued or Discarded units that expired before the cutoff, together with their donation and screening,
+    so a donation chain is always entirely hot or entirely archived;
+  * screenings before the cutoff that never led to a donation;
+  * Fulfilled or Rejected blood requests before the cutoff that no hot unit is allocated to.
+Each batch copies and deletes its rows (and takes archived units out of inventory_summary) in one short
+transaction, so an interrupted job loses nothing and the next run simply continues with what is left:
+    python archive.py
+unit_events stays where it is: it is already partitioned by month and only partition operations remove rows.
+Donor reports and unit traces read the archive on request (?history=full). donor_recall rows are left as
+they are, and `python recall.py --rebuild` reads archive_donations/archive_screenings as well as the hot tables.
+"""
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+import mysql.connector
+
+from inventory_summary import apply_deltas
+
+ARCHIVE_LOCK_NAME = 'blood_bank_archive'
+ARCHIVE_FIRST_YEAR = 2020 # archive tables start with p_history (everything before this year) and one partition per year after
+DEFAULT_ARCHIVE_CONFIG = {'hot_days': 730, 'batch_size': 500, 'max_batches': 200}
+CLOSED_UNIT_STATUSES = ('Issued', 'Discarded')
+CLOSED_REQUEST_STATUSES = ('Fulfilled', 'Rejected')
+FULL_HISTORY = 'full' # ?history=full
+
+HOT_TABLES = {'screenings': 'screenings', 'donations': 'donations', 'blood_units': 'blood_units', 'blood_requests': 'blood_requests'}
+ARCHIVE_TABLES = {table: f"archive_{table}" for table in HOT_TABLES}
+ARCHIVE_COLUMNS = {
+    'screenings': "screening_id, donor_id, staff_id, screening_date, hemoglobin, blood_pressure_systolic, blood_pressure_diastolic, weight_kg, is_eligible, notes, rules_version",
+    'donations': "donation_id, donor_id, screening_id, phlebotomist_staff_id, donation_date, collection_site",
+    'blood_units': "unit_id, donation_id, blood_group, rh_factor, collection_date, expiry_date, status, issued_to_org_id, allocated_request_id",
+    'blood_requests': "request_id, org_id, patient_name, blood_group, rh_factor, quantity, status, request_date",
+}
+
+UNIT_BATCH_QUERY = ("SELECT bu.expiry_date, bu.unit_id, bu.blood_group, bu.rh_factor, bu.status, d.donation_id, d.screening_id, d.donor_id "
+                    "FROM blood_units bu JOIN donations d ON d.donation_id = bu.donation_id "
+                    "WHERE bu.status = %s AND bu.expiry_date < %s AND (bu.expiry_date, bu.unit_id) > (%s, %s) "
+                    "ORDER BY bu.expiry_date, bu.unit_id LIMIT %s FOR UPDATE SKIP LOCKED")
+SCREENING_BATCH_QUERY = ("SELECT s.screening_date, s.screening_id, s.donor_id FROM screenings s "
+                         "WHERE s.screening_date < %s AND (s.screening_date, s.screening_id) > (%s, %s) "
+                         "AND NOT EXISTS (SELECT 1 FROM donations d WHERE d.screening_id = s.screening_id) "
+                         "ORDER BY s.screening_date, s.screening_id LIMIT %s FOR UPDATE SKIP LOCKED")
+REQUEST_BATCH_QUERY = ("SELECT r.request_date, r.request_id FROM blood_requests r "
+                       "WHERE r.request_date < %s AND (r.request_date, r.request_id) > (%s, %s) AND r.status IN (%s, %s) "
+                       "AND NOT EXISTS (SELECT 1 FROM blood_units bu WHERE bu.allocated_request_id = r.request_id) "
+                       "ORDER BY r.request_date, r.request_id LIMIT %s FOR UPDATE SKIP LOCKED")
+
+
+def wants_full_history(args):
+    return args.get('history') == FULL_HISTORY
+
+
+def with_archive(select, params):
+    """`select` (with {screenings}/{donations}/{blood_units}/{blood_requests} table placeholders) over hot UNION ALL archived rows."""
+    return f"({select.format(**HOT_TABLES)}) UNION ALL ({select.format(**ARCHIVE_TABLES)})", (*params, *params)
+
+
+def ensure_partitions(conn, through_year, first_year=ARCHIVE_FIRST_YEAR):
+    """Splits each archive table's pmax so every year up to `through_year` has its own partition; returns the names added."""
+    cursor = conn.cursor()
+    added = []
+    try:
+        cursor.execute("SELECT TABLE_NAME, PARTITION_NAME FROM information_schema.PARTITIONS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME LIKE 'archive\\_%'")
+        existing = set(cursor.fetchall())
+        for table in ARCHIVE_TABLES.values():
+            # Years are added in order, so a missing year is always newer than the newest partition and comes out of pmax.
+            missing = [year for year in range(first_year, through_year + 1) if (table, f"p{year}") not in existing]
+            if not missing: continue
+            parts = ", ".join(f"PARTITION p{year} VALUES LESS THAN ('{year + 1}-01-01')" for year in missing)
+            cursor.execute(f"ALTER TABLE {table} REORGANIZE PARTITION pmax INTO ({parts}, PARTITION pmax VALUES LESS THAN (MAXVALUE))")
+            added += [f"{table}.p{year}" for year in missing]
+    finally:
+        cursor.close()
+    return added
+
+
+def _move(cursor, table, key, ids):
+    """Copies rows `ids` of `table` into its archive table and deletes them from the hot one."""
+    if not ids: return
+    placeholders = ", ".join(['%s'] * len(ids))
+    cursor.execute(f"INSERT INTO {ARCHIVE_TABLES[table]} ({ARCHIVE_COLUMNS[table]}) SELECT {ARCHIVE_COLUMNS[table]} FROM {table} WHERE {key} IN ({placeholders})", ids)
+    cursor.execute(f"DELETE FROM {table} WHERE {key} IN ({placeholders})", ids)
+
+
+def _archive_batches(conn, name, fetch, move, batch_size, max_batches):
+    """Runs fetch(cursor, after) -> rows and move(cursor, rows) in one transaction per batch; returns rows moved.
+
+    Rows start with their (date, id) sort key; `after` is the last one seen, so rows left behind (locked, or
+    still referenced) are not rescanned by the next batch.
+    """
+    moved, after = 0, None
+    cursor = conn.cursor()
+    try:
+        for _ in range(max_batches):
+            try:
+                rows = fetch(cursor, after)
+                if rows: move(cursor, rows)
+                conn.commit()
+            except Exception:
+                conn.rollback(); raise
+            moved += len(rows)
+            if len(rows) < batch_size: break
+            after = rows[-1][:2]
+    finally:
+        cursor.close()
+    if moved: print(f"[ARCHIVE] {moved} {name} archived")
+    return moved
+
+
+def archive_units(conn, cutoff, batch_size=500, max_batches=200, donor_ids=None):
+    """Archives closed units that expired before `cutoff` with their donations and screenings; returns units moved."""
+    def move(cursor, rows):
+        _move(cursor, 'blood_units', 'unit_id', [row[1] for row in rows]) # children first, for the foreign keys
+        _move(cursor, 'donations', 'donation_id', [row[5] for row in rows])
+        _move(cursor, 'screenings', 'screening_id', [row[6] for row in rows])
+        apply_deltas(cursor, {key: -count for key, count in Counter((row[2], row[3], row[4]) for row in rows).items()})
+        if donor_ids is not None: donor_ids.update(row[7] for row in rows)
+
+    moved = 0
+    for status in CLOSED_UNIT_STATUSES:
+        def fetch(cursor, after):
+            cursor.execute(UNIT_BATCH_QUERY, (status, cutoff, *(after or (date.min, 0)), batch_size))
+            return cursor.fetchall()
+        moved += _archive_batches(conn, f"{status} unit(s)", fetch, move, batch_size, max_batches)
+    return moved
+
+
+def archive_screenings(conn, cutoff, batch_size=500, max_batches=200, donor_ids=None):
+    """Archives screenings before `cutoff` that have no donation; returns screenings moved."""
+    def fetch(cursor, after):
+        cursor.execute(SCREENING_BATCH_QUERY, (cutoff, *(after or (datetime.min, 0)), batch_size))
+        return cursor.fetchall()
+
+    def move(cursor, rows):
+        _move(cursor, 'screenings', 'screening_id', [row[1] for row in rows])
+        if donor_ids is not None: donor_ids.update(row[2] for row in rows)
+
+    return _archive_batches(conn, "screening(s) without a donation", fetch, move, batch_size, max_batches)
+
+
+def archive_requests(conn, cutoff, batch_size=500, max_batches=200):
+    """Archives Fulfilled or Rejected requests before `cutoff` that no hot unit points to; returns requests moved."""
+    def fetch(cursor, after):
+        cursor.execute(REQUEST_BATCH_QUERY, (cutoff, *(after or (datetime.min, 0)), *CLOSED_REQUEST_STATUSES, batch_size))
+        return cursor.fetchall()
+
+    return _archive_batches(conn, "closed request(s)", fetch, lambda cursor, rows: _move(cursor, 'blood_requests', 'request_id', [row[1] for row in rows]),
+                            batch_size, max_batches)
+
+
+def run_archive(conn, config=None, today=None):
+    """One archival pass under the named lock; returns a summary, or None if another archiver holds the lock.
+
+    Units go first (they reference donations and requests), so their requests can follow in the same pass.
+    """
+    config = {**DEFAULT_ARCHIVE_CONFIG, **(config or {})}
+    cutoff = (today or date.today()) - timedelta(days=config['hot_days'])
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, 0)", (ARCHIVE_LOCK_NAME,))
+        if cursor.fetchone()[0] != 1: return None
+        try:
+            started, donor_ids = datetime.now(), set()
+            for name in ensure_partitions(conn, cutoff.year): print(f"[ARCHIVE] added partition {name}")
+            batching = (config['batch_size'], config['max_batches'])
+            moved = {"units": archive_units(conn, cutoff, *batching, donor_ids=donor_ids),
+                     "screenings": archive_screenings(conn, datetime.combine(cutoff, datetime.min.time()), *batching, donor_ids=donor_ids),
+                     "blood_requests": archive_requests(conn, datetime.combine(cutoff, datetime.min.time()), *batching)}
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (ARCHIVE_LOCK_NAME,)); cursor.fetchone()
+    finally:
+        cursor.close()
+    return {"started_at": started, "finished_at": datetime.now(), "cutoff": cutoff, "moved": moved, "donor_ids": sorted(donor_ids)}
+
+
+if __name__ == '__main__':
+    import sys
+    from app import ARCHIVE_CONFIG, DB_CONFIG
+    connection = mysql.connector.connect(**DB_CONFIG)
+    try:
+        # Each pass is bounded by max_batches; keep going until a pass finds nothing left to move.
+        while True:
+            summary = run_archive(connection, ARCHIVE_CONFIG)
+            if summary is None: sys.exit("Another archival job is running.")
+            if not any(summary['moved'].values()): break
+    finally:
+        connection.close()
@@ -0,0 +1,303 @@
+"""ASGI entry point: the high-traffic routes run natively on aiomysql, the rest fall through to app.py.
+
+    uvicorn asgi:app --workers 4
+
+Native handlers reuse app.py's SQL, validation and JSON provider, so their responses are the same bytes
+the Flask routes return, and they record the same request metrics and read-your-writes pin cookie as
+Flask's after_request hooks. Any other route (or a request a native handler declines) is served by the
+Flask app itself on a thread pool, so every endpoint keeps its contract in this mode too.
+"""
+import asyncio
+import io
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from urllib.parse import parse_qsl
+
+import aiomysql
+from asgiref.wsgi import WsgiToAsgiInstance
+from werkzeug.http import dump_cookie
+
+from app import (app as flask_app, COMPRESSION_CONFIG, DB_CONFIG, DB_ROUTER, METRICS, POOL_CONFIG, RECALL_CONFIG, BLOOD_REQUEST_SELECT, DONATION_INSERT,
+                 UNIT_INSERT, donation_created, inventory_page, inventory_page_query)
+from compression import DEFAULT_COMPRESSION_CONFIG, choose_encoding, compress, compressible
+from db_router import PIN_COOKIE, pin_cookie_value
+from inventory_summary import SUMMARY_QUERY, delta_statements
+from recall import donation_statements as recall_donation_statements
+from serialization import columnar, wants_columns
+
+ASYNC_POOL_CONFIG = {'minsize': 1, 'maxsize': POOL_CONFIG['size'], 'pool_recycle': POOL_CONFIG['max_lifetime'],
+                     'borrow_timeout': POOL_CONFIG['borrow_timeout']}
+COMPRESSION = {**DEFAULT_COMPRESSION_CONFIG, **COMPRESSION_CONFIG} # same negotiation as compression.init_app on the Flask side
+FALLBACK_CONFIG = {'workers': POOL_CONFIG['size'], 'stream_workers': 32} # threads for Flask-served requests, and for long-lived streams
+STREAMING_PATHS = ('/api/events', '/api/export/', '/api/recall/export') # SSE and streamed exports hold their thread until done
+
+
+class DatabaseUnavailable(Exception):
+    pass
+
+
+class AsyncDatabase:
+    """aiomysql pool created on first use (or at ASGI lifespan startup), with the sync pool's borrow timeout.
+
+    Connections run in autocommit mode so reads hold no transaction; writes open one with conn.begin().
+    """
+
+    def __init__(self, config, minsize=1, maxsize=10, pool_recycle=1800, borrow_timeout=5):
+        self.config = config
+        self.minsize, self.maxsize, self.pool_recycle, self.borrow_timeout = minsize, maxsize, pool_recycle, borrow_timeout
+        self.pool = None
+        self._lock = asyncio.Lock()
+
+    async def start(self):
+        async with self._lock:
+            if self.pool is None:
+                self.pool = await aiomysql.create_pool(host=self.config['host'], user=self.config['user'], password=self.config['password'],
+                                                       db=self.config['database'], minsize=self.minsize, maxsize=self.maxsize,
+                                                       pool_recycle=self.pool_recycle, autocommit=True)
+
+    async def close(self):
+        if self.pool is not None:
+            self.pool.close(); await self.pool.wait_closed(); self.pool = None
+
+    @asynccontextmanager
+    async def connection(self):
+        try:
+            await self.start()
+            conn = await asyncio.wait_for(self.pool.acquire(), self.borrow_timeout)
+        except (aiomysql.Error, OSError, asyncio.TimeoutError) as err:
+            print(f"Database Connection Error: {err}")
+            raise DatabaseUnavailable() from err
+        try:
+            yield conn
+        finally:
+            if conn.get_transaction_status(): await conn.rollback() # the pool closes connections returned mid-transaction
+            self.pool.release(conn)
+
+
+DB = AsyncDatabase(DB_CONFIG, **ASYNC_POOL_CONFIG)
+
+
+def db_error(err):
+    return err.args[1] if len(err.args) > 1 else str(err)
+
+
+class AsyncRequest:
+    def __init__(self, scope, body):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope['headers']}
+        self.args = {}
+        for key, value in parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True): self.args.setdefault(key, value)
+        self.body = body
+
+    def get_json(self):
+        """The JSON object body, or None when there is none (the handler then defers to Flask's own handling)."""
+        if not self.headers.get('content-type', '').startswith('application/json'): return None
+        try: data = json.loads(self.body or b'null')
+        except ValueError: return None
+        return data if isinstance(data, dict) else None
+
+
+# --- Native routes: each returns (body, status), or None to let the Flask app answer ---
+async def get_inventory(req):
+    try: query, params, limit = inventory_page_query(req.args)
+    except ValueError as err: return {"error": str(err)}, 400
+    async with DB.connection() as conn, conn.cursor(aiomysql.DictCursor) as cursor:
+        await cursor.execute(query, params)
+        return inventory_page(list(await cursor.fetchall()), limit, wants_columns(req.args)), 200
+
+
+async def get_inventory_report(req):
+    async with DB.connection() as conn, conn.cursor(aiomysql.DictCursor) as cursor:
+        await cursor.execute(SUMMARY_QUERY)
+        return list(await cursor.fetchall()), 200
+
+
+async def get_blood_requests(req):
+    async with DB.connection() as conn, conn.cursor(aiomysql.DictCursor) as cursor:
+        await cursor.execute(BLOOD_REQUEST_SELECT + " ORDER BY r.request_date DESC")
+        requests = list(await cursor.fetchall())
+        return columnar(requests) if wants_columns(req.args) else requests, 200
+
+
+async def add_donation(req):
+    data = req.get_json()
+    if data is None or 'idempotency-key' in req.headers: return None # keyed retries go through app.py's idempotency store
+    if not all(data.get(k) for k in ['donor_id', 'screening_id', 'staff_id']):
+        return {"error": "Donor, Screening ID, and Staff must all be selected."}, 400
+    async with DB.connection() as conn, conn.cursor() as cursor:
+        try:
+            await conn.begin()
+            collection_date = datetime.now()
+            await cursor.execute(DONATION_INSERT, (data.get('donor_id'), data.get('screening_id'), data.get('staff_id'), collection_date, 'Main Center'))
+            donation_id = cursor.lastrowid
+            expiry_date = collection_date + timedelta(days=42)
+            blood_group_full = data.get('blood_group', 'O+')
+            await cursor.execute(UNIT_INSERT, (donation_id, blood_group_full[:-1], blood_group_full[-1], collection_date.date(), expiry_date.date()))
+            unit_id = cursor.lastrowid
+            for sql, params in delta_statements({(blood_group_full[:-1], blood_group_full[-1], 'In Stock'): 1}): await cursor.execute(sql, params)
+            for sql, params in recall_donation_statements(data.get('donor_id'), collection_date, RECALL_CONFIG['deferral_days']): await cursor.execute(sql, params)
+            await conn.commit()
+        except aiomysql.IntegrityError as err:
+            await conn.rollback()
+            if err.args[0] != 1062: return {"error": f"Transaction failed: {db_error(err)}"}, 500
+            await cursor.execute("SELECT d.donation_id, bu.unit_id FROM donations d LEFT JOIN blood_units bu ON bu.donation_id = d.donation_id WHERE d.screening_id = %s", (data.get('screening_id'),))
+            existing = await cursor.fetchone()
+            if not existing: return {"error": f"Transaction failed: {db_error(err)}"}, 500
+            return {"error": "This screening already has a donation.", "donation_id": existing[0], "unit_id": existing[1]}, 409
+        except aiomysql.Error as err:
+            await conn.rollback(); return {"error": f"Transaction failed: {db_error(err)}"}, 500
+    try: staff_id = int(data.get('staff_id'))
+    except (TypeError, ValueError): staff_id = None
+    donation_created(data.get('donor_id'), donation_id, unit_id, blood_group_full, expiry_date.date(), staff_id)
+    return {"message": "Donation and Blood Unit created successfully!", "donation_id": donation_id, "unit_id": unit_id}, 201
+
+
+ROUTES = {
+    ('GET', '/api/inventory'): get_inventory,
+    ('GET', '/api/reports/inventory'): get_inventory_report,
+    ('GET', '/api/blood_requests'): get_blood_requests,
+    ('POST', '/api/donations'): add_donation,
+}
+
+
+class ClientDisconnected(OSError):
+    pass
+
+
+class ThreadedWsgi:
+    """Serves a WSGI app under ASGI with each request on a pool thread, as a threaded WSGI server would.
+
+    (asgiref's WsgiToAsgi runs every request on one shared thread, so a single open stream stalled the rest.)
+    Streaming paths get a pool of their own, so open SSE streams and exports cannot starve ordinary routes,
+    and a client disconnect ends a stream at its next chunk, closing the response iterable.
+    """
+
+    def __init__(self, wsgi_app, workers, stream_workers, streaming_paths=()):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='wsgi')
+        self.stream_executor = ThreadPoolExecutor(stream_workers, thread_name_prefix='wsgi-stream')
+        self.streaming_paths = tuple(streaming_paths)
+
+    async def __call__(self, scope, receive, send):
+        body, more = b'', True
+        while more:
+            message = await receive()
+            if message['type'] == 'http.disconnect': return
+            body += message.get('body', b''); more = message.get('more_body', False)
+        loop, disconnected = asyncio.get_running_loop(), threading.Event()
+
+        async def watch_disconnect():
+            while (await receive())['type'] != 'http.disconnect': pass
+            disconnected.set()
+
+        def send_sync(message):
+            if disconnected.is_set(): raise ClientDisconnected()
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        watcher = asyncio.ensure_future(watch_disconnect())
+        executor = self.stream_executor if scope['path'].startswith(self.streaming_paths) else self.executor
+        try:
+            await loop.run_in_executor(executor, self._run, scope, body, send_sync)
+        finally:
+            watcher.cancel()
+
+    def _run(self, scope, body, send_sync):
+        adapter = WsgiToAsgiInstance(self.wsgi_app) # only for its scope -> environ translation
+        adapter.scope = scope
+        try: environ = adapter.build_environ(scope, io.BytesIO(body))
+        except ValueError: # too many duplicate headers
+            send_sync({'type': 'http.response.start', 'status': 400, 'headers': [(b'content-type', b'text/plain')]})
+            send_sync({'type': 'http.response.body', 'body': b'Bad Request'}); return
+        start = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and start.get('sent'): raise exc_info[1].with_traceback(exc_info[2])
+            start['message'] = {'type': 'http.response.start', 'status': int(status.split(' ', 1)[0]),
+                                'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]}
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            for chunk in result:
+                if not start.get('sent'): send_sync(start['message']); start['sent'] = True
+                if chunk: send_sync({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            if not start.get('sent'): send_sync(start['message'])
+            send_sync({'type': 'http.response.body'})
+        except ClientDisconnected:
+            pass
+        finally:
+            if hasattr(result, 'close'): result.close() # ends generators (SSE subscriptions, export cursors) per PEP 3333
+
+
+class AsgiApp:
+    def __init__(self, routes, fallback):
+        self.routes = routes
+        self.fallback = ThreadedWsgi(fallback, FALLBACK_CONFIG['workers'], FALLBACK_CONFIG['stream_workers'], STREAMING_PATHS)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan': return await self._lifespan(receive, send)
+        handler = self.routes.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+        if handler is None: return await self.fallback(scope, receive, send)
+
+        body, more = b'', True
+        while more:
+            message = await receive()
+            if message['type'] == 'http.disconnect': return
+            body += message.get('body', b''); more = message.get('more_body', False)
+        req = AsyncRequest(scope, body)
+        started = time.perf_counter()
+        try:
+            result = await handler(req)
+        except DatabaseUnavailable:
+            result = {"error": "Database connection failed"}, 500
+        except aiomysql.Error as err:
+            result = {"error": f"Database error: {db_error(err)}"}, 500
+        if result is None: return await self.fallback(scope, self._replay(body, receive), send)
+        data, status = result
+        headers = []
+        if DB_ROUTER.replicas and req.method not in ('GET', 'HEAD', 'OPTIONS') and status < 400: # what db_router.init_app does for Flask
+            cookie = dump_cookie(PIN_COOKIE, pin_cookie_value(DB_ROUTER), max_age=DB_ROUTER.config['pin_seconds'], httponly=True)
+            headers.append((b'set-cookie', cookie.encode('latin-1')))
+        await self._send_json(req, send, data, status, headers)
+        METRICS.http.observe((req.method, req.path, str(status)), time.perf_counter() - started) # the native paths are their own route rules
+
+    @staticmethod
+    def _replay(body, receive):
+        sent = False
+        async def replay():
+            nonlocal sent
+            if sent: return await receive()
+            sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        return replay
+
+    @staticmethod
+    async def _send_json(req, send, data, status, extra_headers=()):
+        response = flask_app.json.response(data) # the same provider (and bytes) jsonify uses
+        body = response.get_data()
+        headers = [(b'content-type', response.content_type.encode('latin-1')), (b'vary', b'Accept-Encoding'), *extra_headers]
+        encoding = choose_encoding(req.headers.get('accept-encoding')) if compressible(response.mimetype, status, len(body), COMPRESSION) else None
+        if encoding: body = compress(body, encoding, COMPRESSION); headers.append((b'content-encoding', encoding.encode('latin-1')))
+        headers.append((b'content-length', str(len(body)).encode('latin-1')))
+        if 'origin' in req.headers: headers.append((b'access-control-allow-origin', b'*')) # what flask_cors sends for CORS(app)
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    @staticmethod
+    async def _lifespan(receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try: await DB.start()
+                except (aiomysql.Error, OSError) as err: print(f"Database Connection Error: {err}") # retried on first request
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await DB.close()
+                await send({'type': 'lifespan.shutdown.complete'}); return
+
+
+app = AsgiApp(ROUTES, flask_app)
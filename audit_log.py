@@ -0,0 +1,178 @@
+"""Append-only log of blood unit lifecycle events (`unit_events`), written behind the request path.
+
+Routes call AuditLog.record() after they commit; a writer thread drains the bounded queue and inserts
+in batches, so a status change costs the request a queue put, not a round trip. unit_events is
+partitioned by month (ensure_partitions() adds the coming months) and triggers reject UPDATE/DELETE;
+old months leave only by partition operations. Events still queued when a process dies are lost, so
+the log is an audit trail, not the source of truth for blood_units.status.
+"""
+import atexit
+import queue
+import threading
+from datetime import date, datetime
+
+import mysql.connector
+
+from archive import ARCHIVE_TABLES, HOT_TABLES
+
+EVENT_SOURCES = ('donation', 'api', 'batch', 'allocation', 'sweeper') # what made the change, for events with no staff_id
+EVENT_INSERT = ("INSERT INTO unit_events (occurred_at, unit_id, from_status, to_status, org_id, request_id, staff_id, source) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)")
+DEFAULT_AUDIT_CONFIG = {'queue_size': 10000, 'batch_size': 500, 'flush_interval': 1.0, 'put_timeout': 0.05, 'months_ahead': 2}
+
+TRACE_QUERY = """
+    SELECT bu.unit_id, CONCAT(bu.blood_group, bu.rh_factor) AS blood_type, bu.status, bu.collection_date, bu.expiry_date,
+           bu.issued_to_org_id, bu.allocated_request_id,
+           d.donation_id, d.donation_date, d.collection_site, d.phlebotomist_staff_id,
+           s.screening_id, s.screening_date, s.is_eligible, s.hemoglobin, s.blood_pressure_systolic, s.blood_pressure_diastolic,
+           s.weight_kg, s.rules_version, s.staff_id AS screening_staff_id,
+           dn.donor_id, dn.first_name, dn.last_name, CONCAT(dn.blood_group, dn.rh_factor) AS donor_blood_type
+    FROM {blood_units} bu
+    JOIN {donations} d ON bu.donation_id = d.donation_id
+    JOIN {screenings} s ON d.screening_id = s.screening_id
+    JOIN donors dn ON d.donor_id = dn.donor_id
+    WHERE bu.unit_id = %s
+"""
+EVENTS_QUERY = ("SELECT event_id, occurred_at, from_status, to_status, org_id, request_id, staff_id, source "
+                "FROM unit_events WHERE unit_id = %s ORDER BY occurred_at, event_id")
+
+
+def unit_event(unit_id, from_status, to_status, source, org_id=None, request_id=None, staff_id=None, occurred_at=None):
+    """One unit_events row; from_status is None when the unit was created."""
+    return (occurred_at or datetime.now(), unit_id, from_status, to_status, org_id, request_id, staff_id, source)
+
+
+def _month_start(year, month):
+    return date(year + (month - 1) // 12, (month - 1) % 12 + 1, 1)
+
+
+def ensure_partitions(conn, today=None, months_ahead=2):
+    """Splits the catch-all pmax partition so this month and the next `months_ahead` each have their own; returns the names added."""
+    today = today or date.today()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT PARTITION_NAME FROM information_schema.PARTITIONS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'unit_events'")
+        existing = {name for (name,) in cursor.fetchall()}
+        months = [_month_start(today.year, today.month + i) for i in range(months_ahead + 1)]
+        missing = [m for m in months if f"p{m:%Y%m}" not in existing]
+        if not missing: return []
+        # Only months after the newest partition are missing, so everything they take comes out of pmax.
+        parts = ", ".join(f"PARTITION p{m:%Y%m} VALUES LESS THAN ('{_month_start(m.year, m.month + 1):%Y-%m-%d}')" for m in missing)
+        cursor.execute(f"ALTER TABLE unit_events REORGANIZE PARTITION pmax INTO ({parts}, PARTITION pmax VALUES LESS THAN (MAXVALUE))")
+        return [f"p{m:%Y%m}" for m in missing]
+    finally:
+        cursor.close()
+
+
+def trace_unit(conn, unit_id, full_history=False):
+    """Unit -> donation -> screening -> donor in one primary-key join, plus the unit's events; None if the unit does not exist.
+
+    With full_history a unit no longer in blood_units is looked up in the archive tables (see archive.py).
+    """
+    cursor = conn.cursor(dictionary=True)
+    try:
+        archived = False
+        cursor.execute(TRACE_QUERY.format(**HOT_TABLES), (unit_id,))
+        row = cursor.fetchone()
+        if row is None and full_history:
+            cursor.execute(TRACE_QUERY.format(**ARCHIVE_TABLES), (unit_id,))
+            row, archived = cursor.fetchone(), True
+        if row is None: return None
+        cursor.execute(EVENTS_QUERY, (unit_id,))
+        events = cursor.fetchall()
+    finally:
+        cursor.close()
+    return {"unit": {k: row[k] for k in ('unit_id', 'blood_type', 'status', 'collection_date', 'expiry_date', 'issued_to_org_id', 'allocated_request_id')},
+            "donation": {k: row[k] for k in ('donation_id', 'donation_date', 'collection_site', 'phlebotomist_staff_id')},
+            "screening": {"screening_id": row['screening_id'], "screening_date": row['screening_date'], "is_eligible": bool(row['is_eligible']),
+                          "hemoglobin": row['hemoglobin'], "bp_systolic": row['blood_pressure_systolic'], "bp_diastolic": row['blood_pressure_diastolic'],
+                          "weight_kg": row['weight_kg'], "rules_version": row['rules_version'], "staff_id": row['screening_staff_id']},
+            "donor": {k: row[k] for k in ('donor_id', 'first_name', 'last_name', 'donor_blood_type')},
+            "events": events, "archived": archived}
+
+
+class AuditLog:
+    """Bounded queue of unit_event() rows plus the thread that batch-inserts them on a connection from `pool`.
+
+    When the queue is full (the database is down or slower than the writes) record() waits up to
+    put_timeout per event and then drops it, counting the loss, rather than stall the request.
+    """
+
+    def __init__(self, pool, config=None):
+        self.pool = pool
+        self.config = {**DEFAULT_AUDIT_CONFIG, **(config or {})}
+        self.queue = queue.Queue(self.config['queue_size'])
+        self.written = 0; self.dropped = 0; self.batches = 0
+        self.last_error = None
+        self._partitions_checked = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def record(self, *events):
+        if not events: return
+        self.start()
+        for event in events:
+            try: self.queue.put(event, timeout=self.config['put_timeout'])
+            except queue.Full:
+                self.dropped += 1
+                print(f"[AUDIT] queue full, dropped {event[3]} event for unit {event[1]}")
+
+    def start(self):
+        if self._thread and self._thread.is_alive(): return
+        with self._start_lock:
+            if self._thread and self._thread.is_alive(): return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop, 5)
+
+    def stop(self, timeout=None):
+        """Flushes what is queued (within `timeout`) and stops the writer."""
+        self._stop.set()
+        if self._thread: self._thread.join(timeout)
+
+    def _take_batch(self):
+        try: batch = [self.queue.get(timeout=self.config['flush_interval'])]
+        except queue.Empty: return []
+        while len(batch) < self.config['batch_size']:
+            try: batch.append(self.queue.get_nowait())
+            except queue.Empty: break
+        return batch
+
+    def _write(self, batch):
+        conn = self.pool.acquire()
+        try:
+            if self._partitions_checked != date.today():
+                for name in ensure_partitions(conn, months_ahead=self.config['months_ahead']): print(f"[AUDIT] added partition {name}")
+                self._partitions_checked = date.today()
+            cursor = conn.cursor()
+            try:
+                cursor.executemany(EVENT_INSERT, batch)
+                conn.commit()
+            except Exception:
+                conn.rollback(); raise
+            finally:
+                cursor.close()
+        finally:
+            conn.close()
+
+    def _run(self):
+        backoff = 0.5
+        while not (self._stop.is_set() and self.queue.empty()):
+            batch = self._take_batch()
+            while batch:
+                try:
+                    self._write(batch)
+                    self.written += len(batch); self.batches += 1; self.last_error = None; backoff = 0.5
+                    batch = None
+                except mysql.connector.Error as err:
+                    self.last_error = f"Database error: {err.msg}"
+                    print(f"[AUDIT] {self.last_error}; retrying {len(batch)} event(s) in {backoff:.1f}s")
+                    if self._stop.wait(backoff):
+                        self.dropped += len(batch); print(f"[AUDIT] stopping, {len(batch)} event(s) not written"); break
+                    backoff = min(backoff * 2, 30)
+
+    def stats(self):
+        return {"queued": self.queue.qsize(), "written": self.written, "dropped": self.dropped, "batches": self.batches,
+                "last_error": self.last_error}
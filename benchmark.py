@@ -0,0 +1,297 @@
+"""Load-test harness: seed synthetic data, drive the API at a fixed concurrency, report latency percentiles.
+
+    python benchmark.py seed --donors 100000                  # appends synthetic rows, writes benchmark_manifest.json
+    python benchmark.py run --concurrency 32 --duration 30 --output results.json
+    python benchmark.py compare baseline.json results.json    # exit code 1 if a route regressed
+
+`run` targets a running server (--base-url) or drives app.py in-process through Flask's test client
+(--in-process). Every route is measured on its own for the same duration and concurrency, and results carry
+the git commit they were taken at, so files from two commits can be compared route by route.
+"""
+import argparse
+import http.client
+import json
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+from urllib.parse import quote, urlsplit
+
+import numpy as np
+
+MANIFEST_PATH = 'benchmark_manifest.json'
+BLOOD_TYPE_WEIGHTS = {'O+': 0.38, 'A+': 0.34, 'B+': 0.09, 'O-': 0.07, 'A-': 0.06, 'AB+': 0.03, 'B-': 0.02, 'AB-': 0.01}
+FIRST_NAMES = ['James', 'Mary', 'Aarav', 'Priya', 'Wei', 'Fatima', 'Carlos', 'Sofia', 'Kwame', 'Amara', 'Liam', 'Olivia', 'Noah', 'Emma',
+               'Ravi', 'Ananya', 'Hiro', 'Yuki', 'Omar', 'Layla', 'Diego', 'Lucia', 'Ivan', 'Elena', 'Tunde', 'Zara', 'Sean', 'Nora']
+SURNAME_STEMS = ['Smith', 'Patel', 'Nguyen', 'Garcia', 'Okafor', 'Kim', 'Singh', 'Rossi', 'Haddad', 'Murphy', 'Silva', 'Khan', 'Cohen',
+                 'Sato', 'Mensah', 'Ivanov', 'Lopez', 'Reddy', 'Brown', 'Wang', 'Jones', 'Sharma', 'Costa', 'Novak', 'Ali']
+SURNAME_SUFFIXES = ['', 'son', 'ley', 'ford', 'wood', 'er', 'ini', 'ov', 'ez', 'ton', 'berg', 'man']
+SEED_DEFAULTS = {'donors': 10000, 'screenings_per_donor': 2.0, 'donation_rate': 0.8, 'requests': 2000, 'organizations': 50, 'staff': 40}
+SEED_CHUNK = 5000
+REGRESSION_THRESHOLD = 0.15
+
+
+# --- Seeding ---
+def _insert(conn, sql, rows):
+    """Inserts rows in chunked executemany transactions; returns the new ids in row order."""
+    from bulk_ingest import insert_chunks
+    ids = []
+    for start in range(0, len(rows), SEED_CHUNK):
+        results = insert_chunks(conn, sql, list(enumerate(rows[start:start + SEED_CHUNK])))
+        errors = [error for _, error in results.values() if error]
+        if errors: raise RuntimeError(f"{len(errors)} seed row(s) failed, first: {errors[0]}")
+        ids += [results[i][0] for i in range(len(results))]
+    return ids
+
+
+def seed(conn, donors=10000, screenings_per_donor=2.0, donation_rate=0.8, requests=2000, organizations=50, staff=40, rng_seed=42):
+    """Appends a synthetic, internally consistent data set and returns the manifest the runner needs."""
+    from app import ACTIVE_RULESET as ruleset
+    from inventory_summary import reconcile
+    rng = np.random.default_rng(rng_seed)
+    tag = f"{rng_seed}-{int(time.time())}"
+    today = date.today()
+    surnames = [stem + suffix for stem in SURNAME_STEMS for suffix in SURNAME_SUFFIXES]
+    blood_types = list(BLOOD_TYPE_WEIGHTS)
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT role_id FROM roles ORDER BY role_id"); role_ids = [r[0] for r in cursor.fetchall()]
+    cursor.close()
+    staff_ids = _insert(conn, "INSERT INTO staff (first_name, last_name, employee_number, role_id) VALUES (%s, %s, %s, %s)",
+                        [(str(rng.choice(FIRST_NAMES)), str(rng.choice(surnames)), f"BENCH-{tag}-{i}", role_ids[i % len(role_ids)]) for i in range(staff)])
+    org_ids = _insert(conn, "INSERT INTO organization (name, org_type, contact_person, contact_phone) VALUES (%s, %s, %s, %s)",
+                      [(f"Bench Hospital {tag}-{i}", 'Hospital' if i % 4 else 'Clinic', str(rng.choice(FIRST_NAMES)), f"555{i:07d}") for i in range(organizations)])
+
+    donor_types = rng.choice(len(blood_types), size=donors, p=list(BLOOD_TYPE_WEIGHTS.values()))
+    donor_rows = []
+    for i in range(donors):
+        blood_type = blood_types[donor_types[i]]
+        dob = today - timedelta(days=int(rng.integers(18 * 365, 65 * 365)))
+        donor_rows.append((str(rng.choice(FIRST_NAMES)), str(rng.choice(surnames)), dob, blood_type[:-1], blood_type[-1], str(rng.choice(['Male', 'Female', 'Other'], p=[0.49, 0.49, 0.02])),
+                           f"07{int(rng.integers(0, 10**9)):09d}", f"bench.{tag}.{i}@example.org"))
+    donor_ids = _insert(conn, "INSERT INTO donors (first_name, last_name, date_of_birth, blood_group, rh_factor, gender, phone_number, email) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)", donor_rows)
+
+    # Screenings: realistic vitals scored by the live ruleset, spread over the last two years.
+    per_donor = rng.poisson(screenings_per_donor, size=donors)
+    owner = np.repeat(np.arange(donors), per_donor)
+    n = len(owner)
+    vitals = np.column_stack([rng.normal(14, 1.2, n).round(1), rng.normal(122, 15, n).round(), rng.normal(78, 9, n).round(), rng.normal(72, 13, n).round(1)])
+    eligible, notes = ruleset.screen(vitals.tolist())
+    screened_at = [datetime.now() - timedelta(minutes=int(m)) for m in rng.integers(60, 730 * 24 * 60, n)]
+    screening_ids = _insert(conn, "INSERT INTO screenings (donor_id, staff_id, screening_date, hemoglobin, blood_pressure_systolic, blood_pressure_diastolic, weight_kg, is_eligible, notes, rules_version) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                            [(donor_ids[owner[j]], staff_ids[j % len(staff_ids)], screened_at[j], float(vitals[j, 0]), int(vitals[j, 1]), int(vitals[j, 2]),
+                              float(vitals[j, 3]), eligible[j], notes[j], ruleset.version) for j in range(n)])
+
+    # Donations for most eligible screenings; the rest stay available for the POST /api/donations scenario.
+    eligible_idx = [j for j in range(n) if eligible[j]]
+    donated = rng.random(len(eligible_idx)) < donation_rate
+    donation_idx = [j for j, d in zip(eligible_idx, donated) if d]
+    spare = [(screening_ids[j], donor_ids[owner[j]], blood_types[donor_types[owner[j]]]) for j, d in zip(eligible_idx, donated) if not d]
+    donated_at = [screened_at[j] + timedelta(minutes=20) for j in donation_idx]
+    donation_ids = _insert(conn, "INSERT INTO donations (donor_id, screening_id, phlebotomist_staff_id, donation_date, collection_site) VALUES (%s, %s, %s, %s, %s)",
+                           [(donor_ids[owner[j]], screening_ids[j], staff_ids[k % len(staff_ids)], donated_at[k], 'Main Center') for k, j in enumerate(donation_idx)])
+
+    unit_rows = []
+    for k, j in enumerate(donation_idx):
+        blood_type = blood_types[donor_types[owner[j]]]
+        collected = donated_at[k].date(); expiry = collected + timedelta(days=42)
+        if expiry < today: status = str(rng.choice(['Issued', 'Discarded'], p=[0.85, 0.15]))
+        else: status = str(rng.choice(['In Stock', 'Reserved', 'Issued', 'Quarantined'], p=[0.7, 0.05, 0.2, 0.05]))
+        unit_rows.append((donation_ids[k], blood_type[:-1], blood_type[-1], collected, expiry, status, int(rng.choice(org_ids)) if status == 'Issued' else None))
+    _insert(conn, "INSERT INTO blood_units (donation_id, blood_group, rh_factor, collection_date, expiry_date, status, issued_to_org_id) VALUES (%s, %s, %s, %s, %s, %s, %s)", unit_rows)
+
+    request_types = rng.choice(len(blood_types), size=requests, p=list(BLOOD_TYPE_WEIGHTS.values()))
+    _insert(conn, "INSERT INTO blood_requests (org_id, patient_name, blood_group, rh_factor, quantity, status) VALUES (%s, %s, %s, %s, %s, %s)",
+            [(int(rng.choice(org_ids)), f"Patient {i}", blood_types[t][:-1], blood_types[t][-1], int(rng.integers(1, 5)),
+              str(rng.choice(['Pending', 'Approved', 'Fulfilled', 'Rejected'], p=[0.2, 0.1, 0.6, 0.1]))) for i, t in enumerate(request_types)])
+    reconcile(conn, repair=True) # bring inventory_summary in line with the units inserted directly
+
+    return {"tag": tag, "rng_seed": rng_seed, "donor_ids": [donor_ids[0], donor_ids[-1]] if donor_ids else [], "staff_ids": staff_ids,
+            "org_ids": org_ids, "surnames": surnames, "first_names": FIRST_NAMES, "spare_screenings": spare,
+            "counts": {"donors": donors, "screenings": n, "donations": len(donation_ids), "units": len(unit_rows), "requests": requests}}
+
+
+# --- Scenarios: name -> fn(rng) returning (method, path, json body) or None when the scenario has run out of data ---
+def build_scenarios(manifest):
+    first_donor, last_donor = manifest["donor_ids"]
+    spare, spare_lock = list(manifest["spare_screenings"]), threading.Lock()
+    blood_types = list(BLOOD_TYPE_WEIGHTS)
+
+    def donation(rng):
+        with spare_lock:
+            if not spare: return None
+            screening_id, donor_id, blood_type = spare.pop()
+        return 'POST', '/api/donations', {"donor_id": donor_id, "screening_id": screening_id, "staff_id": rng.choice(manifest["staff_ids"]), "blood_group": blood_type}
+
+    def screening(rng):
+        return 'POST', '/api/screenings', {"donor_id": rng.randint(first_donor, last_donor), "staff_id": rng.choice(manifest["staff_ids"]),
+                                           "hemoglobin": round(rng.gauss(14, 1.2), 1), "bp_systolic": int(rng.gauss(122, 15)),
+                                           "bp_diastolic": int(rng.gauss(78, 9)), "weight_kg": round(rng.gauss(72, 13), 1)}
+
+    return {
+        'donors_search': lambda rng: ('GET', f"/api/donors/search?q={quote(rng.choice(manifest['surnames'])[:rng.randint(2, 5)])}", None),
+        'donors_search_last_name': lambda rng: ('GET', f"/api/donors/search?last_name={quote(rng.choice(manifest['surnames'])[:3])}", None),
+        'inventory': lambda rng: ('GET', '/api/inventory?limit=50', None),
+        'inventory_filtered': lambda rng: ('GET', f"/api/inventory?status=In%20Stock&blood_type={quote(rng.choice(blood_types))}&expires_within_days=14", None),
+        'inventory_report': lambda rng: ('GET', '/api/reports/inventory', None),
+        'donor_report': lambda rng: ('GET', f"/api/donors/{rng.randint(first_donor, last_donor)}/report", None),
+        'blood_requests': lambda rng: ('GET', '/api/blood_requests', None),
+        'staff': lambda rng: ('GET', '/api/staff', None),
+        'screenings': screening,
+        'donations': donation,
+    }
+
+
+# --- Transports ---
+class HttpClient:
+    """One keep-alive connection per worker thread."""
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        self.host, self.port, self.timeout = parts.hostname, parts.port or 80, timeout
+        self.conn = None
+
+    def request(self, method, path, body):
+        if self.conn is None: self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        payload = json.dumps(body) if body is not None else None
+        try:
+            self.conn.request(method, path, payload, {'Content-Type': 'application/json'} if payload else {})
+            response = self.conn.getresponse(); response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            self.conn.close(); self.conn = None
+            return 0 # transport error
+
+
+class InProcessClient:
+    def __init__(self, flask_app):
+        self.client = flask_app.test_client()
+
+    def request(self, method, path, body):
+        response = self.client.open(path, method=method, json=body)
+        response.get_data(); response.close()
+        return response.status_code
+
+
+def run_scenario(make_client, scenario, concurrency, duration, warmup, rng_seed):
+    """Runs one scenario from `concurrency` threads; samples taken during warm-up are dropped."""
+    start = time.perf_counter()
+    measure_from, stop_at = start + warmup, start + warmup + duration
+    samples = [[] for _ in range(concurrency)]
+
+    def worker(n):
+        client, rng, out = make_client(), random.Random(rng_seed + n), samples[n]
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at: return
+            call = scenario(rng)
+            if call is None: return
+            began = time.perf_counter()
+            status = client.request(*call)
+            ended = time.perf_counter()
+            if began >= measure_from: out.append((ended - began, status))
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    elapsed = max(min(time.perf_counter(), stop_at) - measure_from, 1e-9)
+    flat = [s for worker_samples in samples for s in worker_samples]
+    if not flat: return {"requests": 0, "errors": 0, "throughput_rps": 0.0}
+    latencies = np.array([s[0] for s in flat]) * 1000
+    statuses = {}
+    for _, status in flat: statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = sum(1 for _, status in flat if status == 0 or status >= 500)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {"requests": len(flat), "errors": errors, "throughput_rps": round(len(flat) / elapsed, 2), "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3), "max_ms": round(float(latencies.max()), 3),
+            "mean_ms": round(float(latencies.mean()), 3), "status_counts": statuses}
+
+
+def git_commit():
+    try: return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError): return None
+
+
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """Per-route p95 and throughput changes; a route regresses when either worsens by more than `threshold`."""
+    report = {}
+    for route, now in current["routes"].items():
+        before = baseline["routes"].get(route)
+        if not before or not before.get("requests") or not now.get("requests"): continue
+        p95_change = now["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+        rps_change = now["throughput_rps"] / before["throughput_rps"] - 1 if before["throughput_rps"] else 0.0
+        report[route] = {"p95_change": round(p95_change, 4), "throughput_change": round(rps_change, 4),
+                         "regressed": p95_change > threshold or rps_change < -threshold}
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_seed = sub.add_parser('seed', help='append synthetic data to the configured database')
+    for key, value in SEED_DEFAULTS.items(): p_seed.add_argument(f"--{key.replace('_', '-')}", type=type(value), default=value)
+    p_seed.add_argument('--rng-seed', type=int, default=42)
+    p_seed.add_argument('--manifest', default=MANIFEST_PATH)
+    p_run = sub.add_parser('run', help='measure each route at a fixed concurrency')
+    p_run.add_argument('--base-url', default='http://127.0.0.1:5000')
+    p_run.add_argument('--in-process', action='store_true', help="drive app.py through Flask's test client instead of HTTP")
+    p_run.add_argument('--routes', help='comma-separated scenario names (default: all)')
+    p_run.add_argument('--concurrency', type=int, default=16)
+    p_run.add_argument('--duration', type=float, default=20)
+    p_run.add_argument('--warmup', type=float, default=3)
+    p_run.add_argument('--rng-seed', type=int, default=42)
+    p_run.add_argument('--manifest', default=MANIFEST_PATH)
+    p_run.add_argument('--output', help='write results JSON here (default: stdout)')
+    p_cmp = sub.add_parser('compare', help='compare two result files; exit 1 on regression')
+    p_cmp.add_argument('baseline'); p_cmp.add_argument('current')
+    p_cmp.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    if args.command == 'seed':
+        import mysql.connector
+        from app import DB_CONFIG
+        conn = mysql.connector.connect(**DB_CONFIG)
+        try:
+            manifest = seed(conn, rng_seed=args.rng_seed, **{key: getattr(args, key) for key in SEED_DEFAULTS})
+        finally:
+            conn.close()
+        with open(args.manifest, 'w') as f: json.dump(manifest, f, default=str)
+        print(json.dumps(manifest["counts"]))
+        return 0
+
+    if args.command == 'compare':
+        with open(args.baseline) as f: baseline = json.load(f)
+        with open(args.current) as f: current = json.load(f)
+        report = compare(baseline, current, args.threshold)
+        print(json.dumps(report, indent=2))
+        return 1 if any(r["regressed"] for r in report.values()) else 0
+
+    with open(args.manifest) as f: manifest = json.load(f)
+    scenarios = build_scenarios(manifest)
+    names = args.routes.split(',') if args.routes else list(scenarios)
+    unknown = [n for n in names if n not in scenarios]
+    if unknown: parser.error(f"unknown route scenario(s): {', '.join(unknown)}")
+    if args.in_process:
+        from app import app as flask_app
+        make_client = lambda: InProcessClient(flask_app)
+    else:
+        make_client = lambda: HttpClient(args.base_url)
+    results = {"meta": {"commit": git_commit(), "started_at": datetime.now().isoformat(timespec='seconds'), "target": 'in-process' if args.in_process else args.base_url,
+                        "concurrency": args.concurrency, "duration": args.duration, "warmup": args.warmup, "rng_seed": args.rng_seed,
+                        "dataset": manifest["counts"], "python": platform.python_version()}, "routes": {}}
+    for name in names:
+        results["routes"][name] = stats = run_scenario(make_client, scenarios[name], args.concurrency, args.duration, args.warmup, args.rng_seed)
+        print(f"{name:<26} {stats['throughput_rps']:>9} req/s  p50 {stats.get('p50_ms', '-')} ms  p95 {stats.get('p95_ms', '-')} ms  "
+              f"p99 {stats.get('p99_ms', '-')} ms  errors {stats['errors']}", file=sys.stderr)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f: f.write(output + '\n')
+    else: print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
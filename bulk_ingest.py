@@ -0,0 +1,73 @@
+"""Batch upload helpers: read JSON/CSV batches and insert them in chunked executemany transactions."""
+import csv
+import io
+
+import mysql.connector
+
+BATCH_CHUNK_SIZE = 500
+MAX_BATCH_ROWS = 10000
+
+
+def read_batch_rows(req, key):
+    """Returns the rows of a batch upload: a JSON array, a {key: [...]} object, or a CSV file in the 'file' form field."""
+    upload = req.files.get('file')
+    if upload:
+        reader = csv.DictReader(io.TextIOWrapper(upload.stream, encoding='utf-8-sig'))
+        return [{k.strip(): (v.strip() or None) if isinstance(v, str) else v for k, v in row.items() if k} for row in reader]
+    data = req.get_json(silent=True)
+    if isinstance(data, dict): data = data.get(key)
+    if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+        raise ValueError(f"Expected a JSON array of {key}, {{\"{key}\": [...]}} or a CSV upload in the 'file' field.")
+    return data
+
+
+def consecutive_ids(conn):
+    """True when a multi-row INSERT's AUTO_INCREMENT ids are lastrowid, lastrowid + 1, ... on this connection.
+
+    Not so with auto_increment_increment > 1 (e.g. multi-primary setups), where ids step by the increment.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT @@SESSION.auto_increment_increment")
+        return cursor.fetchone()[0] == 1
+    finally:
+        cursor.close()
+
+
+def insert_chunks(conn, sql, batch, chunk_size=BATCH_CHUNK_SIZE):
+    """Inserts [(row_index, values)] with one executemany and one commit per chunk.
+
+    Returns {row_index: (new_id, error)}. A multi-row INSERT gets consecutive AUTO_INCREMENT ids starting at
+    lastrowid (InnoDB allocates them in one step for simple inserts) only when auto_increment_increment = 1;
+    otherwise every chunk is inserted row by row so each row gets its own lastrowid. If a chunk fails, it is
+    replayed row by row in one transaction so only the offending rows are reported as errors.
+    """
+    results = {}
+    bulk = consecutive_ids(conn)
+    cursor = conn.cursor()
+    try:
+        for start in range(0, len(batch), chunk_size):
+            chunk = batch[start:start + chunk_size]
+            if bulk:
+                try:
+                    cursor.executemany(sql, [values for _, values in chunk])
+                    first_id = cursor.lastrowid
+                    conn.commit()
+                    for offset, (index, _) in enumerate(chunk): results[index] = (first_id + offset, None)
+                    continue
+                except mysql.connector.Error:
+                    conn.rollback()
+            for index, values in chunk:
+                try:
+                    cursor.execute(sql, values)
+                    results[index] = (cursor.lastrowid, None)
+                except mysql.connector.Error as err:
+                    results[index] = (None, f"Database error: {err.msg}")
+            try:
+                conn.commit()
+            except mysql.connector.Error as err:
+                conn.rollback()
+                for index, _ in chunk: results[index] = (None, f"Database error: {err.msg}")
+    finally:
+        cursor.close()
+    return results
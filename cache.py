@@ -0,0 +1,62 @@
+"""Small in-process TTL + LRU cache for hot read paths."""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe mapping whose entries expire after `ttl` seconds; the least recently used entry goes first when full.
+
+    Each worker process has its own cache, so writers must call invalidate() and `ttl` bounds how stale
+    another worker's copy can get. A reader that builds a value from the database takes generation(key)
+    first and passes it to set(), which then refuses the value if the key was invalidated in between
+    (the read may predate the write that invalidated it).
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._generations = OrderedDict() # key -> counter value at its last invalidation
+        self._counter = 0
+        self._forgotten = 0 # highest generation dropped from _generations; unknown keys report it, so a drop never looks unchanged
+        self.hits = 0; self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None: del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def generation(self, key):
+        with self._lock: return self._generations.get(key, self._forgotten)
+
+    def set(self, key, value, generation=None):
+        """Stores `value`; with a `generation` from before the value was read, returns False instead if `key` was invalidated since."""
+        with self._lock:
+            if generation is not None and self._generations.get(key, self._forgotten) != generation: return False
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize: self._data.popitem(last=False)
+            return True
+
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+                self._counter += 1
+                self._generations[key] = self._counter
+                self._generations.move_to_end(key)
+            while len(self._generations) > 4 * self.maxsize: self._forgotten = self._generations.popitem(last=False)[1]
+
+    def clear(self):
+        with self._lock: self._data.clear()
+
+    def stats(self):
+        with self._lock: return {"size": len(self._data), "maxsize": self.maxsize, "ttl": self.ttl, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,51 @@
+"""gzip / brotli compression of API responses, negotiated from Accept-Encoding.
+
+Only complete (non-streamed) text and JSON bodies of at least min_size bytes are compressed; brotli is
+preferred when the client accepts it and the `brotli` package is installed.
+"""
+import gzip
+
+from flask import request
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError: # optional: gzip only
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/html', 'text/plain', 'text/csv', 'application/javascript', 'text/css')
+DEFAULT_COMPRESSION_CONFIG = {'min_size': 1024, 'gzip_level': 6, 'brotli_quality': 4} # low brotli qualities suit per-request compression
+
+
+def choose_encoding(accept_encoding):
+    """'br', 'gzip' or None for an Accept-Encoding header value, honouring q-values (q=0 refuses)."""
+    accept = parse_accept_header(accept_encoding or '')
+    best = max(('br', 'gzip') if brotli else ('gzip',), key=accept.quality) # ties go to br
+    return best if accept.quality(best) > 0 else None
+
+
+def compress(body, encoding, config=DEFAULT_COMPRESSION_CONFIG):
+    if encoding == 'br': return brotli.compress(body, quality=config['brotli_quality'])
+    return gzip.compress(body, compresslevel=config['gzip_level'], mtime=0)
+
+
+def compressible(mimetype, status, size, config=DEFAULT_COMPRESSION_CONFIG):
+    return mimetype in COMPRESSIBLE_MIMETYPES and 200 <= status and status not in (204, 304) and size >= config['min_size']
+
+
+def init_app(app, config=None):
+    config = {**DEFAULT_COMPRESSION_CONFIG, **(config or {})}
+
+    @app.after_request
+    def _compress_response(response):
+        if response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers: return response
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES: return response
+        response.vary.add('Accept-Encoding')
+        if not compressible(response.mimetype, response.status_code, response.content_length or 0, config): return response
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+        if encoding is None: return response
+        response.set_data(compress(response.get_data(), encoding, config))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak: response.set_etag(etag, weak=True) # the compressed bytes differ from the identity ones
+        return response
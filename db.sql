@@ -15,14 +15,20 @@ CREATE TABLE `donors` (
   `donor_id` INT NOT NULL AUTO_INCREMENT, `first_name` VARCHAR(100) NOT NULL, `last_name` VARCHAR(100) NOT NULL,
   `date_of_birth` DATE NOT NULL, `blood_group` ENUM('A', 'B', 'AB', 'O') NOT NULL, `rh_factor` ENUM('+', '-') NOT NULL,
   `gender` ENUM('Male', 'Female', 'Other') NULL, `phone_number` VARCHAR(20) NULL, `email` VARCHAR(255) NULL UNIQUE,
-  `registration_date` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (`donor_id`)
+  `registration_date` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (`donor_id`),
+  -- Donor search: prefix range scans per column, ngram FULLTEXT for fuzzy matches (set ngram_token_size=3 for trigrams)
+  KEY `idx_donors_last_first` (`last_name`, `first_name`), KEY `idx_donors_first_name` (`first_name`), KEY `idx_donors_phone` (`phone_number`),
+  FULLTEXT KEY `ft_donors_search` (`first_name`, `last_name`, `email`) WITH PARSER ngram
 ) ENGINE=InnoDB;
 
 CREATE TABLE `screenings` (
   `screening_id` INT NOT NULL AUTO_INCREMENT, `donor_id` INT NOT NULL, `staff_id` INT NOT NULL,
   `screening_date` DATETIME NOT NULL, `hemoglobin` DECIMAL(5,2) NULL, `blood_pressure_systolic` INT NULL,
   `blood_pressure_diastolic` INT NULL, `weight_kg` DECIMAL(5,2) NULL, `is_eligible` BOOLEAN NOT NULL, `notes` TEXT NULL,
+  `rules_version` VARCHAR(20) NULL, -- eligibility ruleset that produced is_eligible/notes (eligibility.py)
   PRIMARY KEY (`screening_id`),
+  KEY `idx_screenings_donor_date` (`donor_id`, `screening_date`), -- donor history, newest first
+  KEY `idx_screenings_date` (`screening_date`), -- archival batches
   CONSTRAINT `fk_screenings_donor_id` FOREIGN KEY (`donor_id`) REFERENCES `donors` (`donor_id`),
   CONSTRAINT `fk_screenings_staff_id` FOREIGN KEY (`staff_id`) REFERENCES `staff` (`staff_id`)
 ) ENGINE=InnoDB;
@@ -31,6 +37,8 @@ CREATE TABLE `donations` (
   `donation_id` INT NOT NULL AUTO_INCREMENT, `donor_id` INT NOT NULL, `screening_id` INT NOT NULL UNIQUE,
   `phlebotomist_staff_id` INT NOT NULL, `donation_date` DATETIME NOT NULL, `collection_site` VARCHAR(255) NOT NULL,
   PRIMARY KEY (`donation_id`),
+  KEY `idx_donations_screening_cover` (`screening_id`, `donation_id`, `donation_date`, `phlebotomist_staff_id`), -- covers the donor report join
+  KEY `idx_donations_date` (`donation_date`), -- demand snapshot refresh reads only the days since the last one
   CONSTRAINT `fk_donations_donor_id` FOREIGN KEY (`donor_id`) REFERENCES `donors` (`donor_id`),
   CONSTRAINT `fk_donations_screening_id` FOREIGN KEY (`screening_id`) REFERENCES `screenings` (`screening_id`),
   CONSTRAINT `fk_donations_staff_id` FOREIGN KEY (`phlebotomist_staff_id`) REFERENCES `staff` (`staff_id`)
@@ -53,11 +61,28 @@ CREATE TABLE `blood_units` (
   `collection_date` DATE NOT NULL, `expiry_date` DATE NOT NULL,
   `status` ENUM('In Stock', 'Reserved', 'Issued', 'Quarantined', 'Discarded') NOT NULL,
   `issued_to_org_id` INT NULL, -- This column was missing its table
+  `allocated_request_id` INT NULL, -- blood request the unit was reserved/issued for (FK added after blood_requests)
   PRIMARY KEY (`unit_id`), 
+  -- Inventory filters (status / blood type / expiry window); InnoDB appends unit_id for keyset paging
+  KEY `idx_units_status_type_expiry` (`status`, `blood_group`, `rh_factor`, `expiry_date`),
+  KEY `idx_units_expiry` (`expiry_date`),
+  KEY `idx_units_status_expiry` (`status`, `expiry_date`), -- expiry sweeper batches and near-expiry alerts
+  -- First-expiry-first-out allocation; its (blood_group, rh_factor, status) prefix also serves the blood type filters, so no
+  -- separate type/status index. With type and status both fixed, the unit_id page is a LIMIT top-N sort of that one range.
+  KEY `idx_units_fefo` (`blood_group`, `rh_factor`, `status`, `expiry_date`),
+  KEY `idx_units_request` (`allocated_request_id`, `status`),
   CONSTRAINT `fk_units_donation_id` FOREIGN KEY (`donation_id`) REFERENCES `donations` (`donation_id`),
   CONSTRAINT `fk_units_org_id` FOREIGN KEY (`issued_to_org_id`) REFERENCES `organization` (`org_id`) -- This relationship was broken
 ) ENGINE=InnoDB;
 
+-- Unit counts per blood type and status, kept in step with blood_units by the API (see inventory_summary.py)
+CREATE TABLE `inventory_summary` (
+  `blood_group` ENUM('A', 'B', 'AB', 'O') NOT NULL, `rh_factor` ENUM('+', '-') NOT NULL,
+  `status` ENUM('In Stock', 'Reserved', 'Issued', 'Quarantined', 'Discarded') NOT NULL,
+  `unit_count` INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (`blood_group`, `rh_factor`, `status`)
+) ENGINE=InnoDB;
+
 -- THIS TABLE WAS MISSING
 CREATE TABLE `blood_requests` (
   `request_id` INT NOT NULL AUTO_INCREMENT,
@@ -69,9 +94,90 @@ CREATE TABLE `blood_requests` (
   `status` ENUM('Pending', 'Approved', 'Rejected', 'Fulfilled') NOT NULL DEFAULT 'Pending',
   `request_date` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
   PRIMARY KEY (`request_id`),
+  KEY `idx_requests_date` (`request_date`), -- demand snapshot refresh
   CONSTRAINT `fk_requests_org_id` FOREIGN KEY (`org_id`) REFERENCES `organization` (`org_id`)
 ) ENGINE=InnoDB;
 
+-- Per-donor last donation / next eligible date for recall lists, kept current by add_donation and add_screening (recall.py)
+CREATE TABLE `donor_recall` (
+  `donor_id` INT NOT NULL, `blood_group` ENUM('A', 'B', 'AB', 'O') NOT NULL, `rh_factor` ENUM('+', '-') NOT NULL,
+  `last_donation_date` DATETIME NOT NULL, `next_eligible_date` DATE NOT NULL,
+  `last_screening_date` DATETIME NULL, `last_screening_eligible` BOOLEAN NULL, -- latest screening, which may postdate the donation
+  PRIMARY KEY (`donor_id`),
+  KEY `idx_recall_type_due` (`blood_group`, `rh_factor`, `last_screening_eligible`, `next_eligible_date`, `donor_id`), -- keyset-paged recall per type
+  CONSTRAINT `fk_recall_donor_id` FOREIGN KEY (`donor_id`) REFERENCES `donors` (`donor_id`)
+) ENGINE=InnoDB;
+
+-- Units collected and requested per closed day and blood type, appended by forecast.py (demand forecasting)
+CREATE TABLE `demand_daily` (
+  `day` DATE NOT NULL, `blood_group` ENUM('A', 'B', 'AB', 'O') NOT NULL, `rh_factor` ENUM('+', '-') NOT NULL,
+  `collected` INT NOT NULL DEFAULT 0, `requested` INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (`day`, `blood_group`, `rh_factor`)
+) ENGINE=InnoDB;
+
+-- Append-only unit lifecycle log, written in batches by audit_log.py. Partitioned by month (the writer splits
+-- pmax ahead of time); no foreign keys, as partitioned InnoDB tables cannot have them.
+CREATE TABLE `unit_events` (
+  `event_id` BIGINT NOT NULL AUTO_INCREMENT, `occurred_at` DATETIME NOT NULL, `unit_id` INT NOT NULL,
+  `from_status` ENUM('In Stock', 'Reserved', 'Issued', 'Quarantined', 'Discarded') NULL, -- NULL: unit created
+  `to_status` ENUM('In Stock', 'Reserved', 'Issued', 'Quarantined', 'Discarded') NOT NULL,
+  `org_id` INT NULL, `request_id` INT NULL, `staff_id` INT NULL,
+  `source` ENUM('donation', 'api', 'batch', 'allocation', 'sweeper') NOT NULL,
+  PRIMARY KEY (`event_id`, `occurred_at`),
+  KEY `idx_unit_events_unit` (`unit_id`, `occurred_at`) -- per-unit traceability
+) ENGINE=InnoDB ROW_FORMAT=COMPRESSED
+PARTITION BY RANGE COLUMNS (`occurred_at`) (
+  PARTITION p_history VALUES LESS THAN ('2026-01-01'),
+  PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
+CREATE TRIGGER `unit_events_no_update` BEFORE UPDATE ON `unit_events` FOR EACH ROW SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'unit_events is append-only';
+CREATE TRIGGER `unit_events_no_delete` BEFORE DELETE ON `unit_events` FOR EACH ROW SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'unit_events is append-only';
+
+-- Cold copies of closed screenings, donations, units and requests, moved in batches by archive.py. Same columns as the
+-- hot tables; partitioned by year (archive.py splits pmax as years are reached), so no foreign keys.
+CREATE TABLE `archive_screenings` (
+  `screening_id` INT NOT NULL, `donor_id` INT NOT NULL, `staff_id` INT NOT NULL,
+  `screening_date` DATETIME NOT NULL, `hemoglobin` DECIMAL(5,2) NULL, `blood_pressure_systolic` INT NULL,
+  `blood_pressure_diastolic` INT NULL, `weight_kg` DECIMAL(5,2) NULL, `is_eligible` BOOLEAN NOT NULL, `notes` TEXT NULL,
+  `rules_version` VARCHAR(20) NULL, `archived_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`screening_id`, `screening_date`),
+  KEY `idx_archive_screenings_donor_date` (`donor_id`, `screening_date`) -- full donor history
+) ENGINE=InnoDB ROW_FORMAT=COMPRESSED
+PARTITION BY RANGE COLUMNS (`screening_date`) (PARTITION p_history VALUES LESS THAN ('2020-01-01'), PARTITION pmax VALUES LESS THAN (MAXVALUE));
+
+CREATE TABLE `archive_donations` (
+  `donation_id` INT NOT NULL, `donor_id` INT NOT NULL, `screening_id` INT NOT NULL,
+  `phlebotomist_staff_id` INT NOT NULL, `donation_date` DATETIME NOT NULL, `collection_site` VARCHAR(255) NOT NULL,
+  `archived_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`donation_id`, `donation_date`),
+  KEY `idx_archive_donations_screening` (`screening_id`),
+  KEY `idx_archive_donations_donor` (`donor_id`, `donation_date`) -- donor_recall rebuilds (recall.py)
+) ENGINE=InnoDB ROW_FORMAT=COMPRESSED
+PARTITION BY RANGE COLUMNS (`donation_date`) (PARTITION p_history VALUES LESS THAN ('2020-01-01'), PARTITION pmax VALUES LESS THAN (MAXVALUE));
+
+CREATE TABLE `archive_blood_units` (
+  `unit_id` INT NOT NULL, `donation_id` INT NOT NULL,
+  `blood_group` ENUM('A', 'B', 'AB', 'O') NOT NULL, `rh_factor` ENUM('+', '-') NOT NULL,
+  `collection_date` DATE NOT NULL, `expiry_date` DATE NOT NULL,
+  `status` ENUM('In Stock', 'Reserved', 'Issued', 'Quarantined', 'Discarded') NOT NULL,
+  `issued_to_org_id` INT NULL, `allocated_request_id` INT NULL, `archived_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`unit_id`, `collection_date`), -- unit traces
+  KEY `idx_archive_units_donation` (`donation_id`)
+) ENGINE=InnoDB ROW_FORMAT=COMPRESSED
+PARTITION BY RANGE COLUMNS (`collection_date`) (PARTITION p_history VALUES LESS THAN ('2020-01-01'), PARTITION pmax VALUES LESS THAN (MAXVALUE));
+
+CREATE TABLE `archive_blood_requests` (
+  `request_id` INT NOT NULL, `org_id` INT NOT NULL, `patient_name` VARCHAR(255) NULL,
+  `blood_group` ENUM('A', 'B', 'AB', 'O') NOT NULL, `rh_factor` ENUM('+', '-') NOT NULL, `quantity` INT NOT NULL,
+  `status` ENUM('Pending', 'Approved', 'Rejected', 'Fulfilled') NOT NULL,
+  `request_date` DATETIME NOT NULL, -- TIMESTAMP in blood_requests; RANGE COLUMNS cannot partition on TIMESTAMP
+  `archived_at` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`request_id`, `request_date`)
+) ENGINE=InnoDB ROW_FORMAT=COMPRESSED
+PARTITION BY RANGE COLUMNS (`request_date`) (PARTITION p_history VALUES LESS THAN ('2020-01-01'), PARTITION pmax VALUES LESS THAN (MAXVALUE));
+
+ALTER TABLE `blood_units` ADD CONSTRAINT `fk_units_request_id` FOREIGN KEY (`allocated_request_id`) REFERENCES `blood_requests` (`request_id`);
+
 CREATE TABLE `tasks` ( `task_id` INT NOT NULL AUTO_INCREMENT, `task_name` VARCHAR(100) NOT NULL UNIQUE, `description` TEXT NULL, PRIMARY KEY (`task_id`) ) ENGINE=InnoDB;
 INSERT INTO `tasks` (`task_name`) VALUES ('Donor Screening'), ('Blood Collection'), ('Unit Processing'), ('Inventory Management'), ('Data Entry'), ('System Administration'), ('Donor Outreach');
 
@@ -0,0 +1,152 @@
+"""Bounded, health-checked MySQL connection pool shared by app.py and api_server_new.py."""
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+from mysql.connector.errors import PoolError
+from flask import g, has_app_context
+
+
+class PooledConnection:
+    """Proxy around a raw mysql.connector connection; close() hands it back to the pool."""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self._scoped = False
+        self._checked_out = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._raw.cursor(*args, **kwargs)
+        return self._pool.cursor_wrapper(cursor) if self._pool.cursor_wrapper else cursor
+
+    def close(self):
+        # Request-scoped connections stay borrowed until the app context tears down,
+        # so helpers called later in the same request can reuse them.
+        if not self._scoped: self.release()
+
+    def release(self):
+        if not self._checked_out: return
+        self._checked_out = False; self._scoped = False
+        self._pool._put(self)
+
+
+class ConnectionPool:
+    """Thread-safe pool with a hard size cap, borrow timeout, max lifetime and idle health checks."""
+
+    def __init__(self, config, size=10, max_lifetime=1800, borrow_timeout=5, health_check_interval=30):
+        self.config = dict(config)
+        self.size = size
+        self.max_lifetime = max_lifetime
+        self.borrow_timeout = borrow_timeout
+        self.health_check_interval = health_check_interval
+        self._idle = deque()
+        self._cond = threading.Condition()
+        self._total = 0; self._in_use = 0; self._waiting = 0
+        self._created = 0; self._discarded = 0; self._borrow_timeouts = 0
+        self.cursor_wrapper = None # e.g. instrumentation.TimedCursor; applied to every cursor() call
+        self.acquire_observer = None # called with the seconds each acquire() took
+
+    def acquire(self, timeout=None):
+        """Borrows a connection, waiting up to `timeout` seconds (default borrow_timeout) for a free slot."""
+        started = time.monotonic()
+        deadline = started + (self.borrow_timeout if timeout is None else timeout)
+        while True:
+            conn = self._reserve(deadline)
+            if conn is None:
+                try:
+                    conn = PooledConnection(self, mysql.connector.connect(**self.config))
+                except mysql.connector.Error:
+                    with self._cond: self._total -= 1; self._in_use -= 1; self._cond.notify()
+                    raise
+                with self._cond: self._created += 1
+            elif not self._is_healthy(conn):
+                self._discard(conn); continue
+            conn._checked_out = True
+            if self.acquire_observer: self.acquire_observer(time.monotonic() - started)
+            return conn
+
+    def _reserve(self, deadline):
+        # Returns an idle connection, or None when the caller may open a new one.
+        with self._cond:
+            self._waiting += 1
+            try:
+                while not self._idle and self._total >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._borrow_timeouts += 1
+                        raise PoolError(f"Timed out waiting for a database connection (pool size {self.size}).")
+                    self._cond.wait(remaining)
+                self._in_use += 1
+                if self._idle: return self._idle.pop()
+                self._total += 1
+                return None
+            finally:
+                self._waiting -= 1
+
+    def _is_healthy(self, conn):
+        now = time.monotonic()
+        if now - conn.created_at > self.max_lifetime: return False
+        if now - conn.last_used > self.health_check_interval:
+            try: conn._raw.ping(reconnect=False)
+            except mysql.connector.Error: return False
+        return True
+
+    def _put(self, conn):
+        try:
+            if conn._raw.unread_result: raise mysql.connector.errors.InternalError("Unread result found")
+            if conn._raw.in_transaction: conn._raw.rollback()
+            reusable = time.monotonic() - conn.created_at <= self.max_lifetime
+        except mysql.connector.Error:
+            reusable = False
+        if not reusable: self._discard(conn); return
+        conn.last_used = time.monotonic()
+        with self._cond:
+            self._in_use -= 1
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def _discard(self, conn):
+        try: conn._raw.close()
+        except mysql.connector.Error: pass
+        with self._cond:
+            self._total -= 1; self._in_use -= 1; self._discarded += 1
+            self._cond.notify()
+
+    def metrics(self):
+        with self._cond:
+            return {"size": self.size, "open": self._total, "in_use": self._in_use, "idle": len(self._idle),
+                    "waiting": self._waiting, "created": self._created, "discarded": self._discarded,
+                    "borrow_timeouts": self._borrow_timeouts}
+
+    def closeall(self):
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._total -= len(idle)
+        for conn in idle:
+            try: conn._raw.close()
+            except mysql.connector.Error: pass
+
+
+def request_connection(pool):
+    """Returns the connection bound to the current app context, borrowing one on first use."""
+    if not has_app_context(): return pool.acquire()
+    conn = g.get('_db_conn')
+    if conn is None:
+        conn = pool.acquire(); conn._scoped = True
+        g._db_conn = conn
+    return conn
+
+
+def init_app(app, pool):
+    """Returns each request's borrowed connection to `pool` when its app context ends."""
+    @app.teardown_appcontext
+    def _release_db_connection(exc):
+        conn = g.pop('_db_conn', None)
+        if conn is not None: conn.release()
@@ -0,0 +1,161 @@
+"""Read/write splitting: writes and read-your-writes go to the primary, other reads to a lag-checked replica.
+
+A replica serves reads only while its measured replication lag is at most max_lag_seconds; a lagging,
+stopped or unreachable replica is skipped until it recovers, and with none usable reads fall back to the
+primary. A client that has just written (and any key pinned after a write, such as a donor whose cached
+report was invalidated) reads from the primary for pin_seconds, which should exceed max_lag_seconds.
+The client's pin travels in a cookie rather than by remote address: behind a proxy or NAT many clients
+share one address, and a single write would pin them all. With no replicas configured every read simply uses the primary.
+"""
+import itertools
+import threading
+import time
+
+import mysql.connector
+from flask import g, has_request_context, request
+
+from db_pool import request_connection
+
+PIN_COOKIE = 'db_primary_until' # the client's read-your-writes pin, honoured by every server process
+DEFAULT_ROUTING_CONFIG = {'max_lag_seconds': 5, 'lag_check_interval': 2, 'pin_seconds': 10, 'down_retry_seconds': 10}
+
+
+def replication_lag(conn):
+    """Seconds the replica is behind its source: None when replication is stopped, 0 when `conn` is not a replica at all."""
+    cursor = conn.cursor(dictionary=True)
+    try:
+        try: cursor.execute("SHOW REPLICA STATUS")
+        except mysql.connector.errors.ProgrammingError: cursor.execute("SHOW SLAVE STATUS") # MySQL < 8.0.22
+        row = cursor.fetchone()
+        cursor.fetchall()
+    finally:
+        cursor.close()
+    if row is None: return 0 # a stand-in instance that replicates nothing has nothing to wait for
+    return row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+
+
+class Replica:
+    """One replica pool plus its last lag reading; the reading is refreshed by at most one caller per interval."""
+
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.lag = None
+        self.checked_at = float('-inf')
+        self.down_until = 0.0
+        self.last_error = None
+        self._check_lock = threading.Lock()
+
+    def usable(self, max_lag):
+        return time.monotonic() >= self.down_until and self.lag is not None and self.lag <= max_lag
+
+
+class DatabaseRouter:
+    def __init__(self, primary, replicas=(), config=None):
+        self.primary = primary
+        self.replicas = [Replica(f"replica{i}", pool) for i, pool in enumerate(replicas)]
+        self.config = {**DEFAULT_ROUTING_CONFIG, **(config or {})}
+        self._next = itertools.count()
+        self._pins = {} # key -> monotonic time the pin ends
+        self._lock = threading.Lock()
+        self.reads = {"replica": 0, "primary_pinned": 0, "primary_fallback": 0}
+
+    def count_read(self, target):
+        with self._lock: self.reads[target] += 1
+
+    # --- Pinning ---
+    def pin(self, *keys):
+        until = time.monotonic() + self.config['pin_seconds']
+        with self._lock:
+            for key in keys: self._pins[key] = until
+            if len(self._pins) > 10000: # forget expired pins before the map grows without bound
+                now = time.monotonic()
+                self._pins = {k: t for k, t in self._pins.items() if t > now}
+
+    def pinned(self, *keys):
+        now = time.monotonic()
+        with self._lock: return any(self._pins.get(key, 0) > now for key in keys)
+
+    # --- Replica selection ---
+    def _refresh_lag(self, replica):
+        if time.monotonic() - replica.checked_at < self.config['lag_check_interval']: return
+        if not replica._check_lock.acquire(blocking=False): return # another request is checking; use the last reading
+        try:
+            conn = replica.pool.acquire()
+            try: replica.lag = replication_lag(conn)
+            finally: conn.close()
+            replica.last_error = None
+        except mysql.connector.Error as err:
+            replica.lag, replica.last_error = None, f"Database error: {err.msg}"
+            replica.down_until = time.monotonic() + self.config['down_retry_seconds']
+            print(f"[DB ROUTER] {replica.name} unavailable: {err.msg}")
+        finally:
+            replica.checked_at = time.monotonic()
+            replica._check_lock.release()
+
+    def acquire_replica(self):
+        """A connection to a usable replica (round robin), or None when every replica is lagging or down."""
+        if not self.replicas: return None
+        start = next(self._next)
+        for i in range(len(self.replicas)):
+            replica = self.replicas[(start + i) % len(self.replicas)]
+            if time.monotonic() < replica.down_until: continue
+            self._refresh_lag(replica)
+            if not replica.usable(self.config['max_lag_seconds']): continue
+            try: return replica.pool.acquire()
+            except mysql.connector.Error as err:
+                replica.down_until = time.monotonic() + self.config['down_retry_seconds']; replica.last_error = f"Database error: {err.msg}"
+                print(f"[DB ROUTER] {replica.name} unavailable: {err.msg}")
+        return None
+
+    def stats(self):
+        with self._lock: reads, pins = dict(self.reads), len(self._pins)
+        return {"reads": reads, "pins": pins,
+                "replicas": [{"name": r.name, "lag": r.lag, "usable": r.usable(self.config['max_lag_seconds']), "last_error": r.last_error,
+                              **r.pool.metrics()} for r in self.replicas]}
+
+
+def read_connection(router, *pin_keys):
+    """The current request's read connection: a replica unless the pin cookie or a `pin_keys` entry pins it to the primary.
+
+    A request that already holds a primary connection keeps reading from it, so it sees its own writes.
+    """
+    if not has_request_context(): return router.acquire_replica() or router.primary.acquire()
+    if not router.replicas or '_db_conn' in g: return request_connection(router.primary)
+    conn = g.get('_db_conn_read')
+    if conn is not None: return conn
+    if _pin_cookie_active() or router.pinned(*pin_keys):
+        router.count_read("primary_pinned")
+        return request_connection(router.primary)
+    conn = router.acquire_replica()
+    if conn is None:
+        router.count_read("primary_fallback")
+        return request_connection(router.primary)
+    router.count_read("replica")
+    conn._scoped = True
+    g._db_conn_read = conn
+    return conn
+
+
+def pin_cookie_value(router):
+    """PIN_COOKIE for a client that just wrote: the epoch second its pin ends."""
+    return str(int(time.time() + router.config['pin_seconds']))
+
+
+def _pin_cookie_active():
+    try: return float(request.cookies.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError: return False
+
+
+def init_app(app, router):
+    """Pins a client to the primary (by cookie) after each successful write request, and returns read connections at teardown."""
+    @app.after_request
+    def _pin_writer(response):
+        if router.replicas and request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+            response.set_cookie(PIN_COOKIE, pin_cookie_value(router), max_age=router.config['pin_seconds'], httponly=True)
+        return response
+
+    @app.teardown_appcontext
+    def _release_read_connection(exc):
+        conn = g.pop('_db_conn_read', None)
+        if conn is not None: conn.release()
@@ -0,0 +1,121 @@
+"""Front-desk donor search: index-backed prefix matching with a FULLTEXT (ngram) fuzzy fallback."""
+import bisect
+import threading
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+DONOR_SELECT = "SELECT donor_id, first_name, last_name, CONCAT(blood_group, rh_factor) AS blood_type, phone_number, email FROM donors"
+
+
+def escape_like(term):
+    """Escapes LIKE wildcards so user input only ever matches literally."""
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _prefix_rows(cursor, term, limit):
+    # One bounded range scan per indexed column, merged with UNION ALL instead of an OR that defeats the indexes.
+    like = escape_like(term) + '%'
+    columns = ['last_name', 'first_name', 'email']
+    if term[0].isdigit() or term[0] in '+(': columns.append('phone_number')
+    parts, values = [], []
+    for column in columns:
+        parts.append(f"({DONOR_SELECT} WHERE {column} LIKE %s ORDER BY {column} LIMIT %s)"); values += [like, limit]
+    tokens = term.split()
+    if len(tokens) == 2: # "john smi" / "smith jo"
+        for first, last in (tokens, tokens[::-1]):
+            parts.append(f"({DONOR_SELECT} WHERE last_name LIKE %s AND first_name LIKE %s LIMIT %s)")
+            values += [escape_like(last) + '%', escape_like(first) + '%', limit]
+    cursor.execute(" UNION ALL ".join(parts), values)
+    return cursor.fetchall()
+
+
+def _fulltext_rows(cursor, term, limit):
+    cursor.execute(
+        "SELECT donor_id, first_name, last_name, CONCAT(blood_group, rh_factor) AS blood_type, phone_number, email, "
+        "MATCH(first_name, last_name, email) AGAINST (%s) AS relevance FROM donors "
+        "WHERE MATCH(first_name, last_name, email) AGAINST (%s) ORDER BY relevance DESC LIMIT %s", (term, term, limit))
+    return cursor.fetchall()
+
+
+def _match_tier(row, term):
+    first, last = (row.get('first_name') or '').lower(), (row.get('last_name') or '').lower()
+    if term in (first, last, f"{first} {last}", f"{last} {first}"): return 0
+    if last.startswith(term) or f"{first} {last}".startswith(term) or f"{last} {first}".startswith(term): return 1
+    if first.startswith(term): return 2
+    if (row.get('email') or '').lower().startswith(term) or (row.get('phone_number') or '').startswith(term): return 3
+    return 4
+
+
+def find_donors(cursor, query, limit=DEFAULT_LIMIT, prefix_index=None):
+    """Returns up to `limit` donors matching `query` on name, e-mail or phone, best matches first.
+
+    Prefix matches come from `prefix_index` when one is loaded, otherwise from indexed LIKE 'term%' scans;
+    FULLTEXT relevance only fills the remaining slots, so typos still find someone.
+    """
+    term = ' '.join(query.split()).lower()
+    if not term: return []
+    candidates = {}
+    rows = prefix_index.search(term, limit) if prefix_index is not None and prefix_index.loaded else _prefix_rows(cursor, term, limit)
+    for row in rows: candidates.setdefault(row['donor_id'], row)
+    if len(candidates) < limit:
+        for row in _fulltext_rows(cursor, term, limit): candidates.setdefault(row['donor_id'], row)
+    ranked = []
+    for row in candidates.values():
+        tier = _match_tier(row, term)
+        ranked.append((tier, -float(row.pop('relevance', 0) or 0), (row['last_name'] or '').lower(), (row['first_name'] or '').lower(), row['donor_id'], row))
+    ranked.sort(key=lambda item: item[:5])
+    results = []
+    for tier, _, _, _, _, row in ranked[:limit]:
+        row['match'] = 'exact' if tier == 0 else 'prefix' if tier < 4 else 'fuzzy'
+        results.append(row)
+    return results
+
+
+class DonorPrefixIndex:
+    """Optional in-process sorted-key index over donor names, e-mail and phone; add_donor keeps it in sync.
+
+    Each worker process holds its own copy, so donors registered through another worker only appear here
+    after a reload. Leave it disabled when running several workers behind a load balancer.
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._donors = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    @staticmethod
+    def _keys_for(donor):
+        first, last = (donor.get('first_name') or '').lower(), (donor.get('last_name') or '').lower()
+        keys = {first, last, f"{first} {last}", f"{last} {first}", (donor.get('email') or '').lower(), donor.get('phone_number') or ''}
+        keys.discard(''); keys.discard(' ')
+        return keys
+
+    def load(self, cursor, chunk_size=10000):
+        cursor.execute(DONOR_SELECT)
+        keys, donors = [], {}
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows: break
+            for row in rows:
+                donors[row['donor_id']] = row
+                keys.extend((key, row['donor_id']) for key in self._keys_for(row))
+        keys.sort()
+        with self._lock:
+            self._keys, self._donors, self.loaded = keys, donors, True
+
+    def add(self, donor):
+        if not self.loaded: return # the next load() picks it up from the table
+        with self._lock:
+            self._donors[donor['donor_id']] = donor
+            for key in self._keys_for(donor): bisect.insort(self._keys, (key, donor['donor_id']))
+
+    def search(self, term, limit):
+        found = {}
+        with self._lock:
+            i = bisect.bisect_left(self._keys, (term,))
+            while i < len(self._keys) and len(found) < limit and self._keys[i][0].startswith(term):
+                donor_id = self._keys[i][1]
+                found.setdefault(donor_id, dict(self._donors[donor_id]))
+                i += 1
+        return list(found.values())
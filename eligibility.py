@@ -0,0 +1,123 @@
+"""Screening eligibility rules: versioned thresholds evaluated column-wise with NumPy.
+
+A single screening and a 10k-row batch go through the same code path; a batch is just longer columns.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+VITALS = ('hemoglobin', 'bp_systolic', 'bp_diastolic', 'weight_kg')
+ALL_CLEAR_NOTE = "All vitals within range."
+STAFF_NOTES_SEPARATOR = " | Staff Notes: "
+
+
+@dataclass(frozen=True)
+class Threshold:
+    vital: str
+    note: str
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+
+
+class Ruleset:
+    """An immutable, versioned list of thresholds; a vital fails when it is missing or outside [minimum, maximum]."""
+
+    def __init__(self, version, thresholds):
+        self.version = version
+        self.thresholds = tuple(thresholds)
+        self._note_cache = {}
+
+    def _note(self, code):
+        # One notes string per distinct failure pattern (bit i = threshold i failed), in threshold order.
+        if code not in self._note_cache:
+            self._note_cache[code] = ", ".join(t.note for bit, t in enumerate(self.thresholds) if code >> bit & 1) or ALL_CLEAR_NOTE
+        return self._note_cache[code]
+
+    def evaluate(self, columns):
+        """Evaluates {vital: array-like} column-wise; returns (eligible bool array, failure bitmask array)."""
+        codes = np.zeros(len(columns[VITALS[0]]), dtype=np.int64)
+        for bit, t in enumerate(self.thresholds):
+            values = np.asarray(columns[t.vital], dtype=float)
+            ok = ~np.isnan(values)
+            if t.minimum is not None: ok &= values >= t.minimum
+            if t.maximum is not None: ok &= values <= t.maximum
+            codes |= (~ok).astype(np.int64) << bit
+        return codes == 0, codes
+
+    def notes(self, codes, staff_notes=None):
+        """Builds the per-screening notes strings for failure bitmasks, appending any staff notes."""
+        if len(codes) == 0: return []
+        patterns, inverse = np.unique(codes, return_inverse=True)
+        table = [self._note(int(code)) for code in patterns]
+        notes = [table[i] for i in inverse]
+        if staff_notes is not None:
+            notes = [f"{note}{STAFF_NOTES_SEPARATOR}{staff}" if staff else note for note, staff in zip(notes, staff_notes)]
+        return notes
+
+    def screen(self, vitals_rows, staff_notes=None):
+        """Screens [(hemoglobin, bp_systolic, bp_diastolic, weight_kg), ...]; returns ([is_eligible], [notes])."""
+        matrix = np.array(vitals_rows, dtype=float).reshape(-1, len(VITALS))
+        eligible, codes = self.evaluate({vital: matrix[:, i] for i, vital in enumerate(VITALS)})
+        return eligible.tolist(), self.notes(codes, staff_notes)
+
+    def describe(self):
+        return {"version": self.version, "thresholds": [{"vital": t.vital, "min": t.minimum, "max": t.maximum, "note": t.note} for t in self.thresholds]}
+
+
+RULESETS = {}
+
+
+def register_ruleset(version, thresholds):
+    """Adds a ruleset version; versions are never edited in place so past screenings stay explainable."""
+    if version in RULESETS: raise ValueError(f"Ruleset {version} already exists")
+    RULESETS[version] = Ruleset(version, thresholds)
+    return RULESETS[version]
+
+
+register_ruleset('v1', [
+    Threshold('hemoglobin', "Low Hemoglobin", minimum=12.5),
+    Threshold('bp_systolic', "BP (Systolic) out of range", minimum=90, maximum=180),
+    Threshold('bp_diastolic', "BP (Diastolic) out of range", minimum=60, maximum=100),
+    Threshold('weight_kg', "Weight below minimum", minimum=50),
+])
+
+
+def parse_vitals(data):
+    """Reads the four vitals from a screening payload; raises ValueError/TypeError for non-numeric values."""
+    return float(data.get('hemoglobin', 0)), int(data.get('bp_systolic', 0)), int(data.get('bp_diastolic', 0)), float(data.get('weight_kg', 0))
+
+
+def reevaluate_screenings(conn, ruleset, apply=False, chunk_size=20000):
+    """Re-screens every stored screening under `ruleset`, one vectorized pass per keyset-paged chunk.
+
+    With apply=False nothing is written; the result only counts how many screenings would change.
+    """
+    stats = {"version": ruleset.version, "checked": 0, "changed": 0, "now_eligible": 0, "now_ineligible": 0, "applied": apply}
+    cursor = conn.cursor()
+    last_id = 0
+    try:
+        while True:
+            cursor.execute("SELECT screening_id, hemoglobin, blood_pressure_systolic, blood_pressure_diastolic, weight_kg, is_eligible, notes "
+                           "FROM screenings WHERE screening_id > %s ORDER BY screening_id LIMIT %s", (last_id, chunk_size))
+            rows = cursor.fetchall()
+            if not rows: break
+            last_id = rows[-1][0]
+            ids, hemoglobin, systolic, diastolic, weight, was_eligible, old_notes = zip(*rows)
+            eligible, codes = ruleset.evaluate({'hemoglobin': np.array(hemoglobin, dtype=float), 'bp_systolic': np.array(systolic, dtype=float),
+                                                'bp_diastolic': np.array(diastolic, dtype=float), 'weight_kg': np.array(weight, dtype=float)})
+            staff_notes = [n.split(STAFF_NOTES_SEPARATOR, 1)[1] if n and STAFF_NOTES_SEPARATOR in n else None for n in old_notes]
+            notes = ruleset.notes(codes, staff_notes)
+            was_eligible = np.array(was_eligible, dtype=bool)
+            changed = np.flatnonzero((eligible != was_eligible) | (np.array(notes, dtype=object) != np.array(old_notes, dtype=object)))
+            stats["checked"] += len(rows); stats["changed"] += len(changed)
+            stats["now_eligible"] += int((eligible & ~was_eligible).sum()); stats["now_ineligible"] += int((~eligible & was_eligible).sum())
+            if apply and len(changed):
+                cursor.executemany("UPDATE screenings SET is_eligible = %s, notes = %s, rules_version = %s WHERE screening_id = %s",
+                                   [(bool(eligible[i]), notes[i], ruleset.version, ids[i]) for i in changed])
+                conn.commit()
+    except Exception:
+        conn.rollback(); raise
+    finally:
+        cursor.close()
+    return stats
@@ -0,0 +1,90 @@
+"""In-process change-event broker and Server-Sent Events encoding for live dashboards.
+
+Routes publish after they commit; every open /api/events stream gets the event from its own bounded
+queue. Events live in this process only, so each server process streams the writes it handled itself;
+run the API as one (threaded) process when dashboards must see every change.
+"""
+import queue
+import threading
+from collections import deque
+
+from serialization import dumps_bytes
+
+EVENT_HISTORY = 1000 # events kept for Last-Event-ID replay after a reconnect
+SUBSCRIBER_QUEUE_SIZE = 256
+HEARTBEAT_SECONDS = 15
+RESYNC = 'resync' # tells a client to re-fetch its lists: it missed events (slow reader or stale Last-Event-ID)
+
+
+class Subscription:
+    def __init__(self, broker, backlog):
+        self.broker = broker
+        self.queue = queue.Queue(SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+        for event in backlog: self.queue.put_nowait(event)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class EventBroker:
+    """Fans published events out to subscriber queues; a subscriber that falls behind is sent a resync."""
+
+    def __init__(self, history=EVENT_HISTORY):
+        self._lock = threading.Lock()
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._last_id = 0
+
+    def publish(self, event_type, data):
+        with self._lock:
+            self._last_id += 1
+            event = (self._last_id, event_type, dumps_bytes(data).decode())
+            self._history.append(event)
+            for sub in self._subscribers:
+                if sub.overflowed: continue
+                try: sub.queue.put_nowait(event)
+                except queue.Full: sub.overflowed = True
+        return event[0]
+
+    def subscribe(self, last_event_id=None):
+        """Opens a subscription; with a Last-Event-ID still in history the missed events are replayed first."""
+        with self._lock:
+            backlog = []
+            if last_event_id is not None and last_event_id < self._last_id:
+                if self._history and last_event_id >= self._history[0][0] - 1:
+                    backlog = [e for e in self._history if e[0] > last_event_id]
+                if not backlog or len(backlog) > SUBSCRIBER_QUEUE_SIZE:
+                    backlog = [(self._last_id, RESYNC, '{}')]
+            sub = Subscription(self, backlog)
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock: self._subscribers.discard(sub)
+
+    def stats(self):
+        with self._lock: return {"subscribers": len(self._subscribers), "last_event_id": self._last_id}
+
+
+def format_sse(event_id, event_type, data):
+    return f"id: {event_id}\nevent: {event_type}\ndata: {data}\n\n"
+
+
+def iter_sse(sub, heartbeat=HEARTBEAT_SECONDS):
+    """Yields a subscription as an SSE stream, with comment heartbeats so proxies keep idle streams open."""
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            if sub.overflowed:
+                # Drop what is queued and start over from a full reload rather than stream a gappy history.
+                with sub.broker._lock:
+                    sub.queue = queue.Queue(SUBSCRIBER_QUEUE_SIZE); sub.overflowed = False
+                    last_id = sub.broker._last_id
+                yield format_sse(last_id, RESYNC, '{}')
+                continue
+            try: event = sub.queue.get(timeout=heartbeat)
+            except queue.Empty: yield ": keepalive\n\n"; continue
+            yield format_sse(*event)
+    finally:
+        sub.close()
@@ -0,0 +1,139 @@
+"""Expiry sweeper: moves units past expiry_date out of stock and reports units about to expire.
+
+Runs in-process (ExpirySweeper thread, see SWEEP_CONFIG in app.py) or as a worker:
+    python expiry_sweeper.py [--once]
+Every pass walks idx_units_status_expiry in small batches, each its own short transaction, so no
+long-held locks or full scans. A MySQL named lock keeps concurrent sweepers (several server
+processes plus a worker) from doing the same work twice.
+"""
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import mysql.connector
+
+from unit_transitions import transition_units
+
+SWEPT_STATUSES = ('In Stock', 'Reserved') # statuses an expired unit is moved out of
+SWEEP_LOCK_NAME = 'blood_bank_expiry_sweep'
+DEFAULT_SWEEP_CONFIG = {'interval': 300, 'batch_size': 500, 'max_batches': 200, 'expired_status': 'Quarantined', 'alert_days': 3}
+
+
+def sweep_expired(conn, expired_status='Quarantined', batch_size=500, max_batches=200, today=None, on_units_changed=None):
+    """Transitions units that expired before `today`, batch by batch; returns the number moved per status.
+
+    Each batch locks at most `batch_size` units (SKIP LOCKED, so units a user is updating are picked up
+    next pass) and commits with its inventory_summary deltas. `on_units_changed(result)` gets the
+    transition_units result of every committed batch.
+    """
+    today = today or date.today()
+    moved = {}
+    for status in SWEPT_STATUSES:
+        for _ in range(max_batches):
+            result = transition_units(conn, expired_status, where=["bu.status = %s", "bu.expiry_date < %s"], values=(status, today),
+                                      limit=batch_size, order_by='bu.expiry_date, bu.unit_id', skip_locked=True)
+            if result["updated"]:
+                moved[status] = moved.get(status, 0) + result["updated"]
+                if on_units_changed: on_units_changed(result)
+            if len(result["results"]) < batch_size: break
+    return moved
+
+
+def near_expiry_alerts(conn, days=3, today=None):
+    """Counts In Stock units expiring within `days` days, per blood type (a bounded index range scan)."""
+    today = today or date.today()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT CONCAT(blood_group, rh_factor) AS blood_type, COUNT(*) AS units, MIN(expiry_date) AS first_expiry "
+                       "FROM blood_units WHERE status = 'In Stock' AND expiry_date BETWEEN %s AND %s "
+                       "GROUP BY blood_group, rh_factor ORDER BY first_expiry", (today, today + timedelta(days=days)))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def run_sweep(conn, config=None, on_units_changed=None):
+    """One full pass under the named lock; returns a summary, or None if another sweeper holds the lock."""
+    config = {**DEFAULT_SWEEP_CONFIG, **(config or {})}
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, 0)", (SWEEP_LOCK_NAME,))
+        if cursor.fetchone()[0] != 1: return None
+        try:
+            started = datetime.now()
+            moved = sweep_expired(conn, config['expired_status'], config['batch_size'], config['max_batches'], on_units_changed=on_units_changed)
+            alerts = near_expiry_alerts(conn, config['alert_days'])
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (SWEEP_LOCK_NAME,)); cursor.fetchone()
+    finally:
+        cursor.close()
+    for status, count in moved.items(): print(f"[EXPIRY SWEEP] {count} expired {status} unit(s) -> {config['expired_status']}")
+    for alert in alerts: print(f"[NEAR EXPIRY] {alert['units']} {alert['blood_type']} unit(s) expire by {alert['first_expiry']:%Y-%m-%d}")
+    return {"started_at": started, "finished_at": datetime.now(), "expired_status": config['expired_status'], "moved": moved,
+            "near_expiry": alerts, "alert_days": config['alert_days']}
+
+
+class ExpirySweeper:
+    """Background thread running run_sweep every `interval` seconds on a connection borrowed from `pool`."""
+
+    def __init__(self, pool, config=None, on_units_changed=None):
+        self.pool = pool
+        self.config = {**DEFAULT_SWEEP_CONFIG, **(config or {})}
+        self.on_units_changed = on_units_changed
+        self.last_result = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive(): return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='expiry-sweeper', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread: self._thread.join(timeout)
+
+    def run_once(self):
+        conn = None
+        try:
+            conn = self.pool.acquire()
+            result = run_sweep(conn, self.config, self.on_units_changed)
+            if result is not None: self.last_result = result
+            self.last_error = None
+            return result
+        except mysql.connector.Error as err:
+            self.last_error = f"Database error: {err.msg}"
+            print(f"[EXPIRY SWEEP] {self.last_error}")
+        finally:
+            if conn is not None: conn.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try: self.run_once()
+            except Exception as err: self.last_error = str(err); print(f"[EXPIRY SWEEP] {err}")
+            self._stop.wait(self.config['interval'])
+
+    def status(self):
+        return {"running": bool(self._thread and self._thread.is_alive()), "interval": self.config['interval'],
+                "last_result": self.last_result, "last_error": self.last_error}
+
+
+if __name__ == '__main__':
+    import sys
+    from app import AUDIT_LOG, DB_POOL, SWEEP_CONFIG, units_transitioned
+    # Same post-commit hook as the in-process sweeper, so expirations reach unit_events from the worker too.
+    sweeper = ExpirySweeper(DB_POOL, SWEEP_CONFIG, on_units_changed=lambda result: units_transitioned(result, 'sweeper'))
+    try:
+        if '--once' in sys.argv:
+            sweeper.run_once()
+        else:
+            while True:
+                sweeper.run_once()
+                time.sleep(sweeper.config['interval'])
+    except KeyboardInterrupt:
+        pass
+    finally:
+        AUDIT_LOG.stop(30) # flush queued audit events before the process exits
+    if '--once' in sys.argv and sweeper.last_error: sys.exit(1)
@@ -0,0 +1,31 @@
+"""Chunked NDJSON / CSV encoding of large result sets read from an unbuffered cursor."""
+import csv
+import io
+import json
+
+from serialization import json_default
+
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+EXPORT_CHUNK_SIZE = 1000
+
+
+def iter_export(cursor, fmt, chunk_size=EXPORT_CHUNK_SIZE, header=True):
+    """Yields the cursor's rows as NDJSON lines or CSV text, holding at most `chunk_size` rows in memory.
+
+    header=False leaves out the CSV header row, for a later result set appended to the same file.
+    """
+    columns = cursor.column_names
+    if fmt == 'csv':
+        buf = io.StringIO(); writer = csv.writer(buf)
+        if header:
+            writer.writerow(columns)
+            yield buf.getvalue() # header goes out before the first row is fetched
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows: break
+        if fmt == 'csv':
+            buf.seek(0); buf.truncate()
+            writer.writerows(rows)
+            yield buf.getvalue()
+        else:
+            yield ''.join(json.dumps(dict(zip(columns, row)), default=json_default) + '\n' for row in rows)
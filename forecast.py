@@ -0,0 +1,182 @@
+"""Demand forecasting: days of supply, projected expiry losses and shortfalls per blood type.
+
+Collected and requested unit counts per closed day are kept in `demand_daily`. Each refresh aggregates
+only the days since the last snapshot day (re-reading `refresh_overlap_days` for late rows), so a forecast
+reads at most 8 x history_days snapshot rows instead of rescanning donations and blood_requests.
+    python forecast.py [--rebuild]
+rebuilds the whole snapshot, e.g. after backfilling older history.
+"""
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+
+BLOOD_TYPES = tuple((group, rh) for group in ('A', 'B', 'AB', 'O') for rh in ('+', '-'))
+TYPE_INDEX = {blood_type: i for i, blood_type in enumerate(BLOOD_TYPES)}
+SNAPSHOT_LOCK_NAME = 'blood_bank_demand_snapshot'
+DEFAULT_FORECAST_CONFIG = {'history_days': 90, 'short_window': 7, 'long_window': 28, 'horizon_days': 14, 'max_horizon_days': 60,
+                           'refresh_overlap_days': 2, 'target_days_of_supply': 5}
+
+COLLECTED_QUERY = ("SELECT DATE(d.donation_date), bu.blood_group, bu.rh_factor, COUNT(*) FROM donations d "
+                   "JOIN blood_units bu ON bu.donation_id = d.donation_id WHERE d.donation_date >= %s AND d.donation_date < %s "
+                   "GROUP BY DATE(d.donation_date), bu.blood_group, bu.rh_factor")
+REQUESTED_QUERY = ("SELECT DATE(request_date), blood_group, rh_factor, SUM(quantity) FROM blood_requests "
+                   "WHERE status <> 'Rejected' AND request_date >= %s AND request_date < %s GROUP BY DATE(request_date), blood_group, rh_factor")
+SNAPSHOT_INSERT = "INSERT INTO demand_daily (day, blood_group, rh_factor, collected, requested) VALUES (%s, %s, %s, %s, %s)"
+HISTORY_QUERY = "SELECT day, blood_group, rh_factor, collected, requested FROM demand_daily WHERE day >= %s AND day < %s"
+STOCK_QUERY = "SELECT blood_group, rh_factor, unit_count FROM inventory_summary WHERE status = 'In Stock'"
+EXPIRING_QUERY = ("SELECT blood_group, rh_factor, expiry_date, COUNT(*) FROM blood_units "
+                  "WHERE status = 'In Stock' AND expiry_date < %s GROUP BY blood_group, rh_factor, expiry_date")
+
+
+def refresh_snapshot(conn, today=None, history_days=90, overlap_days=2, rebuild=False):
+    """Aggregates closed days not yet in demand_daily; returns the days with activity written, or None if another refresh holds the lock."""
+    today = today or date.today()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, 0)", (SNAPSHOT_LOCK_NAME,))
+        if cursor.fetchone()[0] != 1: return None
+        try:
+            cursor.execute("SELECT MAX(day) FROM demand_daily")
+            last_day = cursor.fetchone()[0]
+            if rebuild: start = date(1970, 1, 1)
+            elif last_day: start = last_day - timedelta(days=overlap_days - 1)
+            else: start = today - timedelta(days=history_days)
+            if start >= today: return 0
+            counts = {}
+            for column, query in enumerate((COLLECTED_QUERY, REQUESTED_QUERY)):
+                cursor.execute(query, (start, today))
+                for day, group, rh, count in cursor.fetchall(): counts.setdefault((day, group, rh), [0, 0])[column] = int(count)
+            # Rewrite the whole range so rows that vanished (a deleted or rejected request) stop counting.
+            cursor.execute("DELETE FROM demand_daily WHERE day >= %s AND day < %s", (start, today))
+            if counts: cursor.executemany(SNAPSHOT_INSERT, [(day, group, rh, c, r) for (day, group, rh), (c, r) in sorted(counts.items())])
+            conn.commit()
+        except Exception:
+            conn.rollback(); raise
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (SNAPSHOT_LOCK_NAME,)); cursor.fetchone()
+    finally:
+        cursor.close()
+    return len({day for day, _, _ in counts})
+
+
+def load_history(conn, start, end):
+    """Reads demand_daily for [start, end) into (collected, requested) int arrays of shape (8 blood types, days)."""
+    days = (end - start).days
+    collected, requested = np.zeros((len(BLOOD_TYPES), days), dtype=np.int64), np.zeros((len(BLOOD_TYPES), days), dtype=np.int64)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(HISTORY_QUERY, (start, end))
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    if rows:
+        offsets = np.fromiter(((day - start).days for day, _, _, _, _ in rows), dtype=np.int64, count=len(rows))
+        types = np.fromiter((TYPE_INDEX[(group, rh)] for _, group, rh, _, _ in rows), dtype=np.int64, count=len(rows))
+        np.add.at(collected, (types, offsets), np.fromiter((row[3] for row in rows), dtype=np.int64, count=len(rows)))
+        np.add.at(requested, (types, offsets), np.fromiter((row[4] for row in rows), dtype=np.int64, count=len(rows)))
+    return collected, requested
+
+
+def load_stock(conn, today, horizon):
+    """In Stock units per blood type, and a (8, horizon + 1) array of those expiring on today + k (column 0 includes already expired)."""
+    stock = np.zeros(len(BLOOD_TYPES), dtype=np.int64)
+    expiring = np.zeros((len(BLOOD_TYPES), horizon + 1), dtype=np.int64)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(STOCK_QUERY)
+        for group, rh, count in cursor.fetchall(): stock[TYPE_INDEX[(group, rh)]] = count
+        cursor.execute(EXPIRING_QUERY, (today + timedelta(days=horizon + 1),))
+        for group, rh, expiry_date, count in cursor.fetchall():
+            expiring[TYPE_INDEX[(group, rh)], max((expiry_date - today).days, 0)] += count
+    finally:
+        cursor.close()
+    return stock, expiring
+
+
+def rolling_rate(daily, window):
+    """Mean per type over the last `window` days, shortened to the days since the first recorded activity."""
+    active = np.flatnonzero(daily.any(axis=0))
+    available = daily.shape[1] - active[0] if active.size else 0
+    window = max(min(window, available), 1)
+    return daily[:, -window:].sum(axis=1) / window
+
+
+def project(stock, expiring, demand_rate, collection_rate):
+    """Projects each type over the horizon, issuing first-expiry-first-out.
+
+    With cumulative demand D(k) through day k and E(k) units expiring by day k, the units lost to expiry by
+    day k are max(0, max over j <= k of E(j) - D(j)); arrivals are newer than current stock, so they never
+    change which units expire. Returns (projected stock per day, cumulative expiry losses per day).
+    """
+    days = np.arange(1, expiring.shape[1] + 1)
+    demand = demand_rate[:, None] * days
+    lost = np.maximum.accumulate(np.maximum(np.cumsum(expiring, axis=1) - demand, 0), axis=1)
+    return stock[:, None] + collection_rate[:, None] * days - demand - lost, lost
+
+
+def build_forecast(collected, requested, stock, expiring, today, config):
+    """Per-type forecast rows from history arrays (8, days) and stock arrays (see load_stock)."""
+    short_rate, long_rate = rolling_rate(requested, config['short_window']), rolling_rate(requested, config['long_window'])
+    demand_rate = np.maximum(short_rate, long_rate) # a surge is not averaged away, a quiet week does not hide normal demand
+    collection_rate = rolling_rate(collected, config['long_window'])
+    projected, lost = project(stock, expiring, demand_rate, collection_rate)
+    with np.errstate(divide='ignore', invalid='ignore'): days_of_supply = np.where(demand_rate > 0, stock / demand_rate, np.inf)
+    short = projected < 0
+    first_short = np.where(short.any(axis=1), short.argmax(axis=1), -1)
+    rows = []
+    for i, (group, rh) in enumerate(BLOOD_TYPES):
+        supply = None if np.isinf(days_of_supply[i]) else round(float(days_of_supply[i]), 1)
+        shortfall_date = today + timedelta(days=int(first_short[i])) if first_short[i] >= 0 else None
+        rows.append({"blood_type": f"{group}{rh}", "in_stock": int(stock[i]), "consumption_rate_short": round(float(short_rate[i]), 2),
+                     "consumption_rate_long": round(float(long_rate[i]), 2), "forecast_daily_demand": round(float(demand_rate[i]), 2),
+                     "collection_rate": round(float(collection_rate[i]), 2), "days_of_supply": supply,
+                     "projected_expiry_losses": int(np.ceil(lost[i, -1])), "projected_stock": round(float(projected[i, -1]), 1),
+                     "shortfall_date": shortfall_date, "shortfall_units": int(np.ceil(max(-projected[i].min(), 0))),
+                     "status": "shortfall" if shortfall_date else "low" if supply is not None and supply < config['target_days_of_supply'] else "ok"})
+    return rows
+
+
+class DemandForecaster:
+    """Refreshes the snapshot at most once per day per process, then forecasts from it."""
+
+    def __init__(self, config=None):
+        self.config = {**DEFAULT_FORECAST_CONFIG, **(config or {})}
+        self.refreshed_on = None
+        self._lock = threading.Lock()
+
+    def refresh(self, conn, today=None, rebuild=False):
+        today = today or date.today()
+        with self._lock:
+            if self.refreshed_on == today and not rebuild: return 0
+            days = refresh_snapshot(conn, today, self.config['history_days'], self.config['refresh_overlap_days'], rebuild)
+            if days is not None: self.refreshed_on = today # else another process is refreshing; read what is there
+            return days
+
+    def forecast(self, conn, horizon=None, today=None):
+        today = today or date.today()
+        horizon = horizon or self.config['horizon_days']
+        self.refresh(conn, today)
+        collected, requested = load_history(conn, today - timedelta(days=self.config['history_days']), today)
+        stock, expiring = load_stock(conn, today, horizon)
+        return {"as_of": today, "horizon_days": horizon, "history_days": self.config['history_days'],
+                "short_window": self.config['short_window'], "long_window": self.config['long_window'],
+                "blood_types": build_forecast(collected, requested, stock, expiring, today, self.config)}
+
+
+if __name__ == '__main__':
+    import sys
+    import mysql.connector
+    from app import DB_CONFIG, FORECAST_CONFIG
+    forecaster = DemandForecaster(FORECAST_CONFIG)
+    connection = mysql.connector.connect(**DB_CONFIG)
+    try:
+        days = forecaster.refresh(connection, rebuild='--rebuild' in sys.argv)
+        print("Another process is refreshing the demand snapshot." if days is None else f"{days} day(s) of demand history refreshed.")
+        report = forecaster.forecast(connection)
+    finally:
+        connection.close()
+    for row in report['blood_types']:
+        print(f"[FORECAST] {row['blood_type']}: {row['in_stock']} in stock, {row['forecast_daily_demand']}/day, "
+              f"{row['days_of_supply'] if row['days_of_supply'] is not None else 'n/a'} days of supply, "
+              f"{row['projected_expiry_losses']} expiring unused, {row['status']}")
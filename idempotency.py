@@ -0,0 +1,108 @@
+"""Idempotency-Key support for POST endpoints that must not run twice when a client retries.
+
+The first request with a key runs the view and its successful response is kept for `ttl` seconds; a replay with the
+same key and body gets that response back (Idempotent-Replayed: true) without touching the database. A
+duplicate that arrives while the original is still running waits for it instead of racing it. Keys are
+per process: behind several workers, pair this with a database uniqueness guarantee.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from itertools import islice
+
+from flask import current_app, jsonify, make_response, request
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyStore:
+    """Bounded TTL map of (path, key) -> [expires_at, request fingerprint, (status, body, mimetype) or None while in flight]."""
+
+    def __init__(self, maxsize=20000, ttl=86400, wait_timeout=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self._entries = OrderedDict()
+        self._cond = threading.Condition()
+        self.replays = 0; self.waits = 0; self.mismatches = 0
+
+    def claim(self, key, fingerprint):
+        """Returns ('owner', None), ('replay', response), ('mismatch', None) or ('busy', None) after wait_timeout."""
+        deadline = time.monotonic() + self.wait_timeout
+        with self._cond:
+            waited = False
+            while True:
+                now = time.monotonic()
+                entry = self._entries.get(key)
+                if entry is not None and entry[2] is not None and entry[0] < now:
+                    del self._entries[key]; entry = None
+                if entry is None:
+                    self._entries[key] = [now + self.ttl, fingerprint, None]
+                    self._evict()
+                    return 'owner', None
+                if entry[1] != fingerprint: self.mismatches += 1; return 'mismatch', None
+                if entry[2] is not None: self.replays += 1; return 'replay', entry[2]
+                if now >= deadline: return 'busy', None
+                if not waited: self.waits += 1; waited = True
+                self._cond.wait(deadline - now)
+
+    def complete(self, key, fingerprint, response):
+        with self._cond:
+            self._entries[key] = [time.monotonic() + self.ttl, fingerprint, response]
+            self._entries.move_to_end(key)
+            self._evict()
+            self._cond.notify_all()
+
+    def _evict(self):
+        """Drops the oldest completed entries beyond maxsize; in-flight keys are never evicted, or a duplicate could slip in."""
+        excess = len(self._entries) - self.maxsize
+        if excess <= 0: return
+        for key in list(islice((k for k, entry in self._entries.items() if entry[2] is not None), excess)): del self._entries[key]
+
+    def release(self, key):
+        """Forgets an in-flight key whose request failed, so a retry runs again (a waiting duplicate takes over)."""
+        with self._cond:
+            self._entries.pop(key, None)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {"size": len(self._entries), "maxsize": self.maxsize, "ttl": self.ttl, "replays": self.replays,
+                    "waits": self.waits, "mismatches": self.mismatches}
+
+
+def idempotent(store, error_body=lambda message: {"error": message}):
+    """Decorator: honours an Idempotency-Key header on the view; requests without one run as before.
+
+    Successful responses are remembered; a 4xx (the client may correct the body and retry), a 5xx or an
+    exception releases the key.
+    `error_body` shapes this decorator's own error responses to match the server's.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key: return view(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH: return jsonify(error_body(f"{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters")), 400
+            scoped_key = (request.path, key)
+            fingerprint = hashlib.sha256(request.get_data()).digest()[:16]
+            state, saved = store.claim(scoped_key, fingerprint)
+            if state == 'replay':
+                status, body, mimetype = saved
+                response = current_app.response_class(body, status=status, mimetype=mimetype)
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+            if state == 'mismatch': return jsonify(error_body(f"{IDEMPOTENCY_HEADER} was already used with a different request body")), 422
+            if state == 'busy': return jsonify(error_body(f"A request with this {IDEMPOTENCY_HEADER} is still in progress")), 409
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                store.release(scoped_key); raise
+            if response.status_code >= 400: store.release(scoped_key)
+            else: store.complete(scoped_key, fingerprint, (response.status_code, response.get_data(), response.mimetype))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,228 @@
+"""Request/SQL instrumentation: latency histograms, a timing cursor wrapper, Prometheus text output, sampling profiler.
+
+init_app() times every Flask request per route; instrument_pool() makes the pool hand out TimedCursors and
+time connection borrows. Metrics live in this process, so each worker exposes its own /metrics.
+"""
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+_SQL_VERB = re.compile(r"^\s*(\w+)")
+_SQL_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE|JOIN)\s+`?(\w+)`?", re.IGNORECASE)
+_PLACEHOLDER_RUN = re.compile(r"%s(?:\s*,\s*%s)+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, as Prometheus expects."""
+
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name, self.help, self.label_names, self.buckets = name, help_text, label_names, buckets
+        self._series = {} # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None: series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound: series[i] += 1
+            series[-2] += 1; series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock: series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            base = _labels(self.label_names, labels)
+            for bound, count in zip(self.buckets, values):
+                lines.append(f"{self.name}_bucket{{{base}{',' if base else ''}le=\"{bound}\"}} {count}")
+            lines.append(f"{self.name}_bucket{{{base}{',' if base else ''}le=\"+Inf\"}} {values[-2]}")
+            lines.append(f"{self.name}_count{{{base}}} {values[-2]}")
+            lines.append(f"{self.name}_sum{{{base}}} {values[-1]:.6f}")
+        return lines
+
+
+class CounterFamily:
+    def __init__(self, name, help_text, label_names):
+        self.name, self.help, self.label_names = name, help_text, label_names
+        self._values = Counter()
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock: self._values[labels] += amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock: values = dict(self._values)
+        lines += [f"{self.name}{{{_labels(self.label_names, labels)}}} {value}" for labels, value in sorted(values.items())]
+        return lines
+
+
+def _labels(names, values):
+    return ",".join(f'{n}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for n, v in zip(names, values))
+
+
+def statement_label(sql):
+    """Low-cardinality name for a statement: verb plus first table, e.g. 'SELECT blood_units'."""
+    verb = _SQL_VERB.match(sql)
+    table = _SQL_TABLE.search(sql)
+    return f"{verb.group(1).upper() if verb else '?'} {table.group(1) if table else '-'}"
+
+
+def redact(sql, params):
+    """SQL with placeholder lists collapsed, and the bound values replaced by their types."""
+    sql = _PLACEHOLDER_RUN.sub("%s, ...", _WHITESPACE.sub(" ", sql).strip())
+    if params is None: return sql, None
+    values = params.values() if isinstance(params, dict) else params
+    return sql, f"[{len(values)} redacted: {', '.join(sorted({type(v).__name__ for v in values}))}]"
+
+
+class Metrics:
+    def __init__(self, slow_query_seconds=0.2):
+        self.slow_query_seconds = slow_query_seconds
+        self.http = Histogram('http_request_duration_seconds', 'Time to produce a response (headers, for streams).', ('method', 'route', 'status'), HTTP_BUCKETS)
+        self.sql = Histogram('db_query_duration_seconds', 'cursor.execute/executemany time per statement kind.', ('statement',), SQL_BUCKETS)
+        self.sql_rows = CounterFamily('db_query_rows_total', 'Rows fetched (SELECT) or affected (DML) per statement kind.', ('statement',))
+        self.slow_queries = CounterFamily('db_slow_queries_total', 'Statements slower than the slow-query threshold.', ('statement',))
+        self.acquire = Histogram('db_pool_acquire_seconds', 'Time spent borrowing a connection from the pool.', (), SQL_BUCKETS)
+        self.gauges = [] # callables returning [(name, help, value)]
+
+    def record_query(self, sql, params, seconds, rows):
+        label = (statement_label(sql),)
+        self.sql.observe(label, seconds)
+        if rows and rows > 0: self.sql_rows.inc(label, rows)
+        if seconds >= self.slow_query_seconds:
+            self.slow_queries.inc(label)
+            text, redacted = redact(sql, params)
+            route = request.url_rule.rule if has_request_context() and request.url_rule else '-'
+            print(f"[SLOW QUERY] {seconds * 1000:.1f} ms route={route} sql={text}{f' params={redacted}' if redacted else ''}")
+
+    def render(self):
+        lines = []
+        for family in (self.http, self.sql, self.sql_rows, self.slow_queries, self.acquire): lines += family.render()
+        for gauge in self.gauges:
+            for name, help_text, value in gauge():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+class TimedCursor:
+    """Wraps a mysql.connector cursor, timing execute/executemany and counting the rows read or written."""
+
+    def __init__(self, cursor, metrics):
+        self._cursor = cursor
+        self._metrics = metrics
+        self._sql = None
+        self._fetched = 0
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _flush_rows(self):
+        # SELECT row counts are known only once fetched; they are attributed when the next statement runs or on close().
+        if self._sql and self._fetched: self._metrics.sql_rows.inc((statement_label(self._sql),), self._fetched)
+        self._sql, self._fetched = None, 0
+
+    def _timed(self, method, sql, params):
+        self._flush_rows()
+        started = time.perf_counter()
+        try:
+            return method(sql, params)
+        finally:
+            elapsed = time.perf_counter() - started
+            rows = self._cursor.rowcount if not self._cursor.with_rows else 0
+            self._metrics.record_query(sql, params, elapsed, rows)
+            if self._cursor.with_rows: self._sql = sql
+
+    def execute(self, operation, params=None):
+        return self._timed(self._cursor.execute, operation, params)
+
+    def executemany(self, operation, seq_params):
+        seq_params = list(seq_params) # the slow-query log describes the first row's parameters
+        return self._timed(lambda sql, _: self._cursor.executemany(sql, seq_params), operation, seq_params[0] if seq_params else None)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None: self._fetched += 1
+        return row
+
+    def fetchmany(self, size=1):
+        rows = self._cursor.fetchmany(size); self._fetched += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall(); self._fetched += len(rows)
+        return rows
+
+    def close(self):
+        self._flush_rows()
+        return self._cursor.close()
+
+
+def instrument_pool(pool, metrics):
+    """Makes `pool` wrap every cursor in a TimedCursor and report how long each borrow waited."""
+    pool.cursor_wrapper = lambda cursor: TimedCursor(cursor, metrics)
+    pool.acquire_observer = lambda seconds: metrics.acquire.observe((), seconds)
+
+
+def init_app(app, metrics):
+    """Times every request; the label is the matched route pattern, so /api/donors/7 and /api/donors/8 share one series."""
+    @app.before_request
+    def _start_timer():
+        g._request_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop('_request_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            metrics.http.observe((request.method, route, str(response.status_code)), time.perf_counter() - started)
+        return response
+
+    @app.teardown_request
+    def _record_failed_request(exc):
+        started = g.pop('_request_started', None) # still set only when after_request never ran (unhandled error)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            metrics.http.observe((request.method, route, '500'), time.perf_counter() - started)
+
+
+class SamplingProfiler:
+    """Samples every thread's stack each `interval` seconds; output is folded stacks ('a;b;c count') for flame graphs."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._lock = threading.Lock() # one profile at a time
+
+    def profile(self, seconds):
+        if not self._lock.acquire(blocking=False): return None
+        try:
+            stacks, me, deadline = Counter(), threading.get_ident(), time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == me: continue
+                    names = []
+                    while frame is not None:
+                        code = frame.f_code
+                        names.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]})")
+                        frame = frame.f_back
+                    stacks[";".join(reversed(names))] += 1
+                time.sleep(self.interval)
+            return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        finally:
+            self._lock.release()
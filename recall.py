@@ -0,0 +1,178 @@
+"""Donor recall: who may donate again, from a per-donor "last donation / next eligible date" index.
+
+`donor_recall` holds one row per donor who has donated: blood type, last donation, the date the
+deferral interval ends and the outcome of the latest screening. add_donation and add_screening
+update it in their own transactions, so a recall list is an index range scan per blood type rather
+than a correlated subquery per donor. Batch paths (screening imports, ruleset re-evaluation) call
+refresh_donors(); `python recall.py --rebuild` recomputes every row, e.g. after changing deferral_days.
+"""
+import base64
+import json
+from datetime import date, timedelta
+
+import mysql.connector
+
+from exports import iter_export
+from forecast import BLOOD_TYPES
+
+DEFAULT_RECALL_CONFIG = {'deferral_days': 56, 'page_size': 50, 'max_page_size': 500} # 56 days: whole-blood donation interval
+_IN_CHUNK = 1000
+
+DONATION_UPSERT = """
+    INSERT INTO donor_recall (donor_id, blood_group, rh_factor, last_donation_date, next_eligible_date, last_screening_date, last_screening_eligible)
+    SELECT dn.donor_id, dn.blood_group, dn.rh_factor, %s, %s, s.screening_date, s.is_eligible
+    FROM donors dn
+    LEFT JOIN screenings s ON s.screening_id = (SELECT screening_id FROM screenings WHERE donor_id = dn.donor_id ORDER BY screening_date DESC, screening_id DESC LIMIT 1)
+    WHERE dn.donor_id = %s
+    ON DUPLICATE KEY UPDATE last_donation_date = GREATEST(last_donation_date, VALUES(last_donation_date)),
+        next_eligible_date = GREATEST(next_eligible_date, VALUES(next_eligible_date)),
+        last_screening_date = VALUES(last_screening_date), last_screening_eligible = VALUES(last_screening_eligible)
+"""
+SCREENING_UPDATE = ("UPDATE donor_recall SET last_screening_date = %s, last_screening_eligible = %s "
+                    "WHERE donor_id = %s AND (last_screening_date IS NULL OR last_screening_date <= %s)")
+# Rebuilds read the archive tables too (archive.py), so donors whose donations or screenings were archived keep their dates.
+REFRESH_SQL = """
+    INSERT INTO donor_recall (donor_id, blood_group, rh_factor, last_donation_date, next_eligible_date, last_screening_date, last_screening_eligible)
+    SELECT dn.donor_id, dn.blood_group, dn.rh_factor, ld.last_donation_date, DATE(ld.last_donation_date) + INTERVAL %s DAY,
+           IF(s.screening_id IS NULL OR sa.screening_date > s.screening_date, sa.screening_date, s.screening_date),
+           IF(s.screening_id IS NULL OR sa.screening_date > s.screening_date, sa.is_eligible, s.is_eligible)
+    FROM (SELECT donor_id, MAX(donation_date) AS last_donation_date
+          FROM (SELECT donor_id, donation_date FROM donations {where} UNION ALL SELECT donor_id, donation_date FROM archive_donations {where}) all_donations
+          GROUP BY donor_id) ld
+    JOIN donors dn ON dn.donor_id = ld.donor_id
+    LEFT JOIN screenings s ON s.screening_id = (SELECT screening_id FROM screenings WHERE donor_id = dn.donor_id ORDER BY screening_date DESC, screening_id DESC LIMIT 1)
+    LEFT JOIN archive_screenings sa ON sa.screening_id = (SELECT screening_id FROM archive_screenings WHERE donor_id = dn.donor_id ORDER BY screening_date DESC, screening_id DESC LIMIT 1)
+    ON DUPLICATE KEY UPDATE blood_group = VALUES(blood_group), rh_factor = VALUES(rh_factor), last_donation_date = VALUES(last_donation_date),
+        next_eligible_date = VALUES(next_eligible_date), last_screening_date = VALUES(last_screening_date), last_screening_eligible = VALUES(last_screening_eligible)
+"""
+RECALL_COLUMNS = ("dn.donor_id, dn.first_name, dn.last_name, dn.phone_number, dn.email, CONCAT(r.blood_group, r.rh_factor) AS blood_type, "
+                  "r.last_donation_date, r.next_eligible_date")
+RECALL_PAGE_QUERY = (f"SELECT {RECALL_COLUMNS} FROM donor_recall r JOIN donors dn ON dn.donor_id = r.donor_id "
+                     "WHERE r.blood_group = %s AND r.rh_factor = %s AND r.last_screening_eligible = 1 AND r.next_eligible_date <= %s "
+                     "AND (r.next_eligible_date, r.donor_id) > (%s, %s) ORDER BY r.next_eligible_date, r.donor_id LIMIT %s")
+RECALL_EXPORT_QUERY = (f"SELECT {RECALL_COLUMNS} FROM donor_recall r JOIN donors dn ON dn.donor_id = r.donor_id "
+                       "WHERE r.blood_group = %s AND r.rh_factor = %s AND r.last_screening_eligible = 1 AND r.next_eligible_date <= %s "
+                       "ORDER BY r.next_eligible_date, r.donor_id")
+
+
+def donation_statements(donor_id, donation_date, deferral_days=DEFAULT_RECALL_CONFIG['deferral_days']):
+    """(sql, params) that record a donation in donor_recall; run them in the donation's transaction."""
+    yield DONATION_UPSERT, (donation_date, donation_date.date() + timedelta(days=deferral_days), donor_id)
+
+
+def record_screening(cursor, donor_id, screening_date, is_eligible):
+    """Keeps the latest screening outcome of a donor already in donor_recall (donors who never donated have no row yet)."""
+    cursor.execute(SCREENING_UPDATE, (screening_date, is_eligible, donor_id, screening_date))
+
+
+def refresh_donors(conn, donor_ids=None, deferral_days=DEFAULT_RECALL_CONFIG['deferral_days']):
+    """Recomputes donor_recall rows from donations/screenings for `donor_ids` (every donor when None); returns rows written."""
+    cursor = conn.cursor()
+    written = 0
+    try:
+        if donor_ids is None:
+            cursor.execute(REFRESH_SQL.format(where=""), (deferral_days,)); written = cursor.rowcount
+        else:
+            donor_ids = sorted({int(d) for d in donor_ids})
+            for start in range(0, len(donor_ids), _IN_CHUNK):
+                chunk = donor_ids[start:start + _IN_CHUNK]
+                cursor.execute(REFRESH_SQL.format(where=f"WHERE donor_id IN ({', '.join(['%s'] * len(chunk))})"), (deferral_days, *chunk, *chunk))
+                written += cursor.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback(); raise
+    finally:
+        cursor.close()
+    return written
+
+
+def parse_blood_types(value):
+    """'O-,A-' -> [('O', '-'), ('A', '-')]; empty -> every type. Raises ValueError for unknown types."""
+    if not value: return list(BLOOD_TYPES)
+    types = []
+    for text in value.split(','):
+        text = text.strip().upper()
+        if text in ('A', 'B', 'AB', 'O'): text += '+' # an unencoded '+' in a query string arrives as a space
+        if (text[:-1], text[-1:]) not in BLOOD_TYPES: raise ValueError(f"Unknown blood type: {text}")
+        if (text[:-1], text[-1:]) not in types: types.append((text[:-1], text[-1:]))
+    return types
+
+
+def prioritize(conn, types):
+    """Orders blood types by shortage: fewest In Stock units first (inventory_summary, at most 8 rows)."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT blood_group, rh_factor, unit_count FROM inventory_summary WHERE status = 'In Stock'")
+        stock = {(group, rh): count for group, rh, count in cursor.fetchall()}
+    finally:
+        cursor.close()
+    return sorted(types, key=lambda t: (stock.get(t, 0), BLOOD_TYPES.index(t)))
+
+
+def encode_cursor(position):
+    return base64.urlsafe_b64encode(json.dumps(position, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(text):
+    """A page cursor back to {"types", "i", "after"}; raises ValueError when it was not produced by encode_cursor."""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(text + '=' * (-len(text) % 4)))
+        types = [tuple(t) for t in position['types']]
+        if not all(t in BLOOD_TYPES for t in types) or not 0 <= position['i'] < len(types): raise ValueError
+        return {"types": types, "i": position['i'], "after": (date.fromisoformat(position['after'][0]), int(position['after'][1]))}
+    except (ValueError, TypeError, KeyError, IndexError): raise ValueError("Invalid cursor")
+
+
+def recall_page(conn, types=None, limit=50, cursor_text=None, today=None):
+    """One page of recallable donors, shortage types first and longest-lapsed first within a type.
+
+    The blood type order is fixed in the cursor, so paging stays consistent while stock levels move.
+    """
+    today = today or date.today()
+    if cursor_text: position = decode_cursor(cursor_text)
+    else: position = {"types": prioritize(conn, types or list(BLOOD_TYPES)), "i": 0, "after": (date.min, 0)}
+    cursor = conn.cursor(dictionary=True)
+    try:
+        # Fill the page type by type; fetching one row past `limit` tells whether another page exists.
+        donors, i, after = [], position['i'], position['after']
+        while i < len(position['types']) and len(donors) <= limit:
+            group, rh = position['types'][i]
+            cursor.execute(RECALL_PAGE_QUERY, (group, rh, today, *after, limit + 1 - len(donors)))
+            donors += cursor.fetchall()
+            i, after = i + 1, (date.min, 0)
+    finally:
+        cursor.close()
+    next_cursor = None
+    if len(donors) > limit:
+        last = donors[limit - 1]
+        last_type = (last['blood_type'][:-1], last['blood_type'][-1])
+        next_cursor = encode_cursor({"types": [list(t) for t in position['types']], "i": position['types'].index(last_type),
+                                     "after": [last['next_eligible_date'].isoformat(), last['donor_id']]})
+        donors = donors[:limit]
+    return {"donors": donors, "next_cursor": next_cursor, "priority": [f"{g}{rh}" for g, rh in position['types']]}
+
+
+def iter_recall_export(conn, types, fmt, today=None):
+    """Streams every recallable donor of `types` as NDJSON or CSV, in the same order as recall_page: shortage types
+    first, longest-lapsed first within a type. One unbuffered query per type."""
+    today = today or date.today()
+    for n, (group, rh) in enumerate(prioritize(conn, types or list(BLOOD_TYPES))):
+        cursor = conn.cursor()
+        try:
+            cursor.execute(RECALL_EXPORT_QUERY, (group, rh, today))
+            yield from iter_export(cursor, fmt, header=n == 0)
+        finally:
+            # An aborted download leaves unread rows; the pool discards that connection on release.
+            try: cursor.close()
+            except mysql.connector.Error: pass
+
+
+if __name__ == '__main__':
+    import sys
+    from app import DB_CONFIG, RECALL_CONFIG
+    if '--rebuild' not in sys.argv: sys.exit("usage: python recall.py --rebuild")
+    connection = mysql.connector.connect(**DB_CONFIG)
+    try:
+        print(f"{refresh_donors(connection, deferral_days=RECALL_CONFIG['deferral_days'])} donor_recall row(s) written.")
+    finally:
+        connection.close()
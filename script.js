@@ -31,17 +31,46 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
     
-    // New function to populate the Unit ID dropdown for Inventory
-    async function populateInventoryDropdown() {
+    // New function to populate the Unit ID dropdown for Inventory.
+    // /inventory is paginated: the first call resets the list, "Load More Units" appends the next page.
+    let INVENTORY_CURSOR = null;
+    async function populateInventoryDropdown(reset = true) {
         const select = document.getElementById('inventory-unit-id');
-        select.innerHTML = `<option value="" disabled selected>-- Select Unit to Update --</option>`;
+        if (reset) {
+            INVENTORY_CURSOR = null;
+            select.innerHTML = `<option value="" disabled selected>-- Select Unit to Update --</option>`;
+        }
         try {
-            const list = await apiFetch('/inventory'); // Fetch latest inventory
-            list.forEach(u => {
+            const page = await apiFetch(`/inventory?limit=50${INVENTORY_CURSOR ? `&cursor=${INVENTORY_CURSOR}` : ''}`);
+            page.units.forEach(u => {
                 select.innerHTML += `<option value="${u.unit_id}">${formatUnitId(u.unit_id)} (${u.blood_type}) - ${u.status}</option>`;
             });
+            INVENTORY_CURSOR = page.next_cursor;
+            const loadMoreBtn = document.getElementById('inventory-load-more-btn');
+            if (loadMoreBtn) loadMoreBtn.style.display = INVENTORY_CURSOR ? 'block' : 'none';
         } catch(error) { /* Handle error silently or show message */ }
     }
+    document.getElementById('inventory-load-more-btn')?.addEventListener('click', () => populateInventoryDropdown(false));
+
+    // Live updates: /api/events pushes unit changes, which are patched into the dropdown instead of re-fetching it.
+    const LIVE_EVENTS = window.EventSource ? new EventSource(`${API_BASE_URL}/events`) : null;
+    function liveEventsConnected() { return !!LIVE_EVENTS && LIVE_EVENTS.readyState === EventSource.OPEN; }
+    function upsertInventoryOption(unit, insertIfMissing = false) {
+        const select = document.getElementById('inventory-unit-id');
+        const text = `${formatUnitId(unit.unit_id)} (${unit.blood_type}) - ${unit.status}`;
+        const option = select.querySelector(`option[value="${unit.unit_id}"]`);
+        if (option) option.textContent = text;
+        else if (insertIfMissing && select.options.length > 1) select.insertBefore(new Option(text, unit.unit_id), select.options[1]);
+    }
+    if (LIVE_EVENTS) {
+        LIVE_EVENTS.addEventListener('unit.created', e => upsertInventoryOption(JSON.parse(e.data), true));
+        LIVE_EVENTS.addEventListener('unit.updated', e => upsertInventoryOption(JSON.parse(e.data)));
+        LIVE_EVENTS.addEventListener('units.updated', e => {
+            const data = JSON.parse(e.data);
+            data.units.forEach(u => upsertInventoryOption({ ...u, status: data.status }));
+        });
+        LIVE_EVENTS.addEventListener('resync', () => populateInventoryDropdown());
+    }
 
     // New function to load all necessary data once or on demand
     async function loadInitialDataForForms() {
@@ -267,8 +296,8 @@ document.getElementById('organization-registration-form').addEventListener('subm
             }); 
             showStatusMessage(`Success! New Unit ID: ${formatUnitId(result.unit_id)}`, 'success'); 
             e.target.reset(); 
-            // Refresh inventory dropdown after a new unit is created
-            populateInventoryDropdown(); 
+            // Refresh inventory dropdown after a new unit is created (live events do this when connected)
+            if (!liveEventsConnected()) populateInventoryDropdown(); 
         } catch (error) {} 
     });
 
@@ -281,8 +310,8 @@ document.getElementById('organization-registration-form').addEventListener('subm
             const result = await apiFetch(`/inventory/${unitId}`, 'PUT', { status: newStatus }); 
             showStatusMessage(result.message, 'success'); 
             e.target.reset(); 
-            // Refresh inventory dropdown after status change
-            populateInventoryDropdown(); 
+            // Refresh inventory dropdown after status change (live events do this when connected)
+            if (!liveEventsConnected()) populateInventoryDropdown(); 
         } catch (error) {} 
     });
     
@@ -0,0 +1,58 @@
+"""JSON encoding shared by the API: dates, datetimes and DECIMAL columns serialize natively.
+
+DECIMALs are written as strings, as Flask's default provider writes them, so exact values such as
+'12.50' keep their scale and clients see the same types as before.
+
+orjson is used when it is installed (the stdlib encoder otherwise, with identical output apart from
+non-ASCII text being written as UTF-8 either way), so handlers hand rows straight to jsonify.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError: # optional speed-up
+    orjson = None
+
+COLUMNS_FORMAT = 'columns' # ?format=columns asks list endpoints for {"columns": [...], "rows": [[...], ...]}
+_ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+
+def json_default(value):
+    if isinstance(value, datetime): return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date): return value.strftime('%Y-%m-%d')
+    if isinstance(value, Decimal): return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_bytes(value):
+    """Compact, key-sorted UTF-8 JSON, with dates and DECIMALs formatted by json_default."""
+    if orjson is not None:
+        try: return orjson.dumps(value, default=json_default, option=_ORJSON_OPTIONS)
+        except TypeError: pass # e.g. an integer wider than 64 bits, which only the stdlib encoder writes
+    return json.dumps(value, default=json_default, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def wants_columns(args):
+    return args.get('format') == COLUMNS_FORMAT
+
+
+def columnar(rows):
+    """{"columns", "rows"} for a list of dict rows: column names are written once instead of once per row."""
+    columns = list(rows[0]) if rows else []
+    return {"columns": columns, "rows": [list(row.values()) for row in rows]}
+
+
+class AppJSONProvider(DefaultJSONProvider):
+    """jsonify() provider that writes MySQL date/time values as 'YYYY-MM-DD[ HH:MM:SS]' instead of HTTP dates."""
+    default = staticmethod(json_default)
+
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj).decode() if not kwargs else super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if self.compact is False or (self.compact is None and self._app.debug): return super().response(*args, **kwargs) # indented
+        return self._app.response_class(dumps_bytes(self._prepare_response_obj(args, kwargs)) + b"\n", mimetype=self.mimetype)
@@ -0,0 +1,77 @@
+"""Blood unit status lifecycle: which transitions are legal, and applying them to many units at once."""
+from collections import Counter
+
+from inventory_summary import apply_deltas
+
+UNIT_STATUSES = ('In Stock', 'Reserved', 'Issued', 'Quarantined', 'Discarded')
+ALLOWED_TRANSITIONS = {
+    'In Stock': {'Reserved', 'Issued', 'Quarantined', 'Discarded'},
+    'Reserved': {'In Stock', 'Issued', 'Quarantined', 'Discarded'},
+    'Quarantined': {'In Stock', 'Discarded'},
+    'Issued': {'Quarantined'}, # returned by the hospital; must be re-inspected before re-stocking
+    'Discarded': set(),
+}
+MAX_TRANSITION_UNITS = 5000
+_IN_CHUNK = 1000
+
+
+def transition_error(old_status, new_status):
+    """Returns why old_status -> new_status is illegal, or None when it is allowed."""
+    if new_status in ALLOWED_TRANSITIONS.get(old_status, ()): return None
+    return f"{old_status} units cannot become {new_status}"
+
+
+def _chunks(items, size=_IN_CHUNK):
+    for start in range(0, len(items), size): yield items[start:start + size]
+
+
+def transition_units(conn, new_status, org_id=None, unit_ids=None, where=None, values=(), all_or_nothing=False, limit=MAX_TRANSITION_UNITS,
+                     order_by='bu.unit_id', skip_locked=False):
+    """Moves the units named by `unit_ids` (or matched by `where`) to `new_status` in one transaction.
+
+    Units are locked, each transition is checked against ALLOWED_TRANSITIONS, and the legal ones are applied
+    with set-based UPDATEs. Returns per-unit outcomes: updated, unchanged, rejected or not_found. With
+    all_or_nothing=True any rejected/missing unit rolls the whole batch back. skip_locked=True (filters only)
+    passes over units another transaction holds instead of waiting for them.
+    """
+    select = ("SELECT bu.unit_id, bu.blood_group, bu.rh_factor, bu.status, d.donor_id "
+              "FROM blood_units bu JOIN donations d ON bu.donation_id = d.donation_id ")
+    cursor = conn.cursor()
+    try:
+        rows = []
+        if unit_ids is not None:
+            for chunk in _chunks(unit_ids):
+                cursor.execute(select + f"WHERE bu.unit_id IN ({', '.join(['%s'] * len(chunk))}) FOR UPDATE OF bu", tuple(chunk))
+                rows += cursor.fetchall()
+        else:
+            cursor.execute(select + f"WHERE {' AND '.join(where)} ORDER BY {order_by} LIMIT %s FOR UPDATE OF bu{' SKIP LOCKED' if skip_locked else ''}",
+                           (*values, limit))
+            rows = cursor.fetchall()
+        found = {row[0]: row for row in rows}
+        results, to_move = [], []
+        for unit_id in (unit_ids if unit_ids is not None else found):
+            row = found.get(unit_id)
+            if row is None: results.append({"unit_id": unit_id, "outcome": "not_found"}); continue
+            old_status = row[3]
+            if old_status == new_status: results.append({"unit_id": unit_id, "outcome": "unchanged"}); continue
+            error = transition_error(old_status, new_status)
+            if error: results.append({"unit_id": unit_id, "outcome": "rejected", "from": old_status, "error": error}); continue
+            to_move.append(row); results.append({"unit_id": unit_id, "outcome": "updated", "from": old_status, "blood_type": f"{row[1]}{row[2]}"})
+        failed = sum(1 for r in results if r["outcome"] in ('rejected', 'not_found'))
+        if (all_or_nothing and failed) or not to_move:
+            conn.rollback()
+            return {"status": new_status, "org_id": None, "applied": False, "updated": 0, "failed": failed, "results": results, "donor_ids": []}
+        for chunk in _chunks([row[0] for row in to_move]):
+            cursor.execute(f"UPDATE blood_units SET status = %s, issued_to_org_id = %s WHERE unit_id IN ({', '.join(['%s'] * len(chunk))})",
+                           (new_status, org_id if new_status == 'Issued' else None, *chunk))
+        deltas = Counter()
+        for _, group, rh, old_status, _ in to_move:
+            deltas[(group, rh, old_status)] -= 1; deltas[(group, rh, new_status)] += 1
+        apply_deltas(cursor, deltas)
+        conn.commit()
+    except Exception:
+        conn.rollback(); raise
+    finally:
+        cursor.close()
+    return {"status": new_status, "org_id": org_id if new_status == 'Issued' else None, "applied": True, "updated": len(to_move), "failed": failed, "results": results,
+            "donor_ids": sorted({row[4] for row in to_move})}